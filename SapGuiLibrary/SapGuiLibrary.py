@@ -1,10 +1,24 @@
-import pythoncom
-import win32com.client
 import time
-from pythoncom import com_error
-import robot.libraries.Screenshot as screenshot
 import os
 from robot.api import logger
+from .backend import com_error, load_backend
+from .datafiles import RowWriter, iter_rows
+from .elementcache import ElementCache
+from .events import connect_session_events
+from .instrumentation import Instrumentation, measure
+from .latencyprofile import LatencyProfile
+from .locators import LocatorIndex, parse_locator
+from .parallel import ReadRecipe, read_in_parallel
+from .pool import SessionPool
+from .recorder import CLIENT_METHODS, parse_recording, read_recording, substitute
+from .registry import SessionRegistry
+from .responsetimes import ResponseTimeRecorder, read_session_info
+from .runner import FAILED_MESSAGE_TYPES, TransactionTemplate, close_popups
+from .screenshots import ScreenshotWriter, capture_window
+from .snapshot import SELECTABLE_TYPES, TEXT_TYPES, ScreenSnapshot
+from .tables import (build_value_index, get_grid_columns, get_table_control_columns, iter_grid_rows,
+                     iter_table_control_rows, match_rows, to_column_list)
+from .trees import TreeIndex
 
 
 class SapGuiLibrary:
@@ -27,31 +41,189 @@ class SapGuiLibrary:
     You need to specify elements starting from the window ID, for example, wnd[0]/tbar[1]/btn[8]. In some cases the SAP
     ID contains backslashes. Make sure you escape these backslashes by adding another backslash in front of it.
 
+    Instead of an ID, every keyword also accepts a locator that finds the element by what is shown on the screen:
+    | *Locator*             | *Finds*                                                                       |
+    | label=Material        | The input field right of the label 'Material', or the check box or radio button with that text |
+    | name=RMMG1-MATNR      | The element with the given name                                               |
+    | text=Save             | The element with the given text, like a button or a label                      |
+    | tooltip=Save (Ctrl+S) | The element with the given tooltip, like a toolbar button                      |
+    | type=GuiCTextField    | The element of the given type                                                  |
+
+    Values are compared without case, repeated whitespace and a trailing colon. All windows of the session are read
+    once when the first locator is used on a screen; until the screen (program and screen number) changes, locators
+    are resolved from this index without asking Sap Gui, also after actions like `input text` or `select checkbox`.
+    A locator that is not found in the index, or whose element no longer exists (like after switching tabs), makes
+    the library read the windows once more. When several elements match, the first one in the topmost window is used.
+    Use `find element` to get the ID a locator resolves to.
+
+    = Backends =
+
+    The library talks to Sap Gui through COM. pywin32 and Robot's Screenshot library are only loaded when they are
+    used for the first time, so the library can be imported without Sap Gui, for example to generate documentation or
+    for a dry-run. With the 'backend' import argument another backend can be used, given as module.ClassName, for
+    example a fake scripting engine for offline tests.
+
     = Screenshots (on error) =
 
     The SapGUILibrary offers an option for automatic screenshots on error.
     Default this option is enabled, use keyword `disable screenshots on error` to skip the screenshot functionality.
     Alternatively, this option can be set at import.
+
+    Screenshots show only the active Sap Gui window. Sap Gui captures the window itself, and the image is written to
+    the screenshot directory (default the output directory) on a background thread, so the test does not wait for the
+    disk. An image identical to an earlier screenshot is not saved again; the log links to the earlier file instead.
+    With the 'screenshot_budget' import argument the total size of the screenshots of a run is limited to the given
+    number of megabytes, later screenshots are skipped with a warning. When there is no session yet, Robot's
+    Screenshot library takes a screenshot of the desktop.
+
+    = Synchronization =
+
+    After each action the library waits before the next keyword is executed. Three modes are available:
+    | *Mode*    | *Behaviour*                                                                                 |
+    | explicit  | Sleeps the time set with `set explicit wait` (default)                                      |
+    | idle      | Waits until the Sap session is no longer busy, up to the synchronization timeout           |
+    | events    | Waits for the end request event of the Sap session, up to the synchronization timeout     |
+
+    In idle mode the session is polled with short, gradually increasing intervals, so the keyword returns as soon as
+    Sap is ready: the session is not busy and its active window can be accessed. In events mode the library
+    subscribes to the events of the session (StartRequest, EndRequest, Change and AbortScripting) and returns as soon
+    as the server request has ended. The server time of each request is written to the debug log and all events can
+    be retrieved with `get session event log`. The explicit wait is still applied on top of it, which is useful for
+    demonstrations. The mode can be set at import or with `set synchronization`.
+
+    = Element cache =
+
+    Each lookup of an element is a round trip to the Sap Gui process. The library therefore keeps the elements it has
+    found on the current screen in a cache. The cache is cleared automatically when the screen (program and screen
+    number) changes and after actions that may lead to a new screen, like `send vkey`, `run transaction` and
+    `click element`. Use `get element cache statistics` to check the hit and miss counters of the cache and
+    `clear element cache` to clear it manually.
+
+    = Session pool =
+
+    With `create session pool` the library opens extra sessions on the current connection, up to the given size (Sap
+    allows 6 sessions per connection by default). `Lease session` makes a free session of the pool the session that
+    all keywords work on and `release session` returns it to the start screen and back to the pool, so logging in once
+    is enough for many tests. When running in parallel with pabot, give each process its own session, for example
+    with `Lease Session    index=${PABOTEXECUTIONPOOLID}`. `Get session pool statistics` returns the number of leases,
+    reuses, wait times and the utilization of the pool.
+
+    = Multiple connections and sessions =
+
+    The library keeps a registry of all open connections and sessions of the Sap Logon Pad. A session can be found by
+    its alias (see `set session alias`), its id (like /app/con[1]/ses[0]), the description of its connection, its
+    system name or its system name and client (like QA1/100). `Switch session` makes the found session active without
+    connecting again. The registry is refreshed automatically when a session cannot be found; only connections that
+    were opened, closed or changed are read again.
+
+    = Screen snapshots =
+
+    `Take screen snapshot` reads the properties of all elements of a window in a single walk of the element tree.
+    Until the next action, `get value`, `element value should be`, `element value should contain`,
+    `get element type` and `get element location` answer from the snapshot instead of asking Sap Gui. Elements are not
+    focused when their value is read from the snapshot.
+
+    = Instrumentation =
+
+    To find out which keywords and screens take the most time, give the path of a CSV or JSON file with the
+    'instrumentation' import argument. Every COM method call and property access is then counted and timed per
+    keyword and per screen (program and screen number). The time of each keyword is split into client COM time,
+    server wait (waiting for the session during idle or events synchronization) and sleep time (the explicit wait).
+    At the end of each suite a summary of the slowest keywords is written to the log and all statistics are written to
+    the file, with a row per keyword and per screen. `Get instrumentation statistics` returns the same rows.
+    Instrumentation adds a little overhead to every COM call, so it is disabled by default.
+
+    | Library | SapGuiLibrary | instrumentation=${OUTPUT DIR}/sap-instrumentation.csv |
+
+    = Response times =
+
+    Sap Gui measures every server interaction of a session. Give the path of a CSV or JSON file with the
+    'response_times' import argument to record these counters after each action that goes to the server, like
+    `click element`, `send vkey`, `run transaction` and `click toolbar button`. Actions that only change the Sap Gui
+    client, like `input text`, `select checkbox` or `fill form`, are not recorded. For every step the transaction,
+    program and screen number are read together with the response time, interpretation time (both in milliseconds),
+    number of round trips and number of flushes. At the end of each suite the steps are aggregated per transaction and
+    screen, with the 50th, 90th, 95th and 99th percentile and the maximum of the times, and written to the file.
+    `Get response time statistics` returns the same rows, so functional suites can also monitor the performance of
+    the Sap system.
+
+    | Library | SapGuiLibrary | response_times=${OUTPUT DIR}/sap-response-times.csv |
+
+    = Slow steps =
+
+    With the 'latency_history' import argument the library learns how long each step usually takes. A step is an
+    action that goes to the server, identified by the transaction, program and screen number it starts on and the
+    keyword. The durations of the last 50 runs of each step are kept in the given JSON file, which is read at import
+    and written at the end of each suite, so it should be kept between test runs. The 95th percentile of these
+    durations is the baseline of a step. When a step takes longer than its baseline multiplied by 'slow_step_factor'
+    (default 2), a warning is written to the log, which gives early notice of a slower Sap system.
+
+    In idle and events synchronization the baseline also sets the timeout of each step: ten times the baseline, at
+    least 5 seconds and at most the synchronization timeout. A step that hangs then fails early instead of waiting
+    for the worst case. A step needs 5 durations before it has a baseline.
+
+    | Library | SapGuiLibrary | synchronization=idle | latency_history=${CURDIR}/sap-latency-history.json |
     """
     __version__ = '1.2'
     ROBOT_LIBRARY_SCOPE = 'GLOBAL'
+    ROBOT_LISTENER_API_VERSION = 2
 
-    def __init__(self, screenshots_on_error=True, screenshot_directory=None):
+    def __init__(self, screenshots_on_error=True, screenshot_directory=None, synchronization="explicit",
+                 synchronization_timeout=30, backend=None, instrumentation=None, response_times=None,
+                 latency_history=None, slow_step_factor=2, screenshot_budget=None):
         """Sets default variables for the library
         """
         self.explicit_wait = float(0.0)
+        self.synchronization = "explicit"
+        self.synchronization_timeout = float(30)
 
         self.sapapp = -1
         self.session = -1
         self.connection = -1
 
+        self.element_cache = ElementCache()
+        self._screen_validated = False
+        self.ROBOT_LIBRARY_LISTENER = self
+
+        self.session_registry = SessionRegistry()
+        self.session_pool = None
+        self._leased_index = None
+        self._session_before_lease = None
+
+        self._event_sink = None
+        self._event_session = None
+        self._event_requests = 0
+
+        self.backend = load_backend(backend)
+
+        self.instrumentation_file = instrumentation
+        self.instrumentation = Instrumentation() if instrumentation else None
+        self.response_times_file = response_times
+        self.response_times = ResponseTimeRecorder() if response_times else None
+        self._keyword_name = None
+        self.latency_profile = LatencyProfile(latency_history, slow_step_factor) if latency_history else None
+        self._step_start = time.time()
+        self._step_screen = None
+
         self.take_screenshots = screenshots_on_error
-        self.screenshot = screenshot.Screenshot()
+        self._screenshot = None
+        self._screenshot_writer = None
+        self.screenshot_directory = screenshot_directory
+        self.screenshot_budget = screenshot_budget
 
         if screenshot_directory is not None:
             if not os.path.exists(screenshot_directory):
                 os.makedirs(screenshot_directory)
-            self.screenshot.set_screenshot_directory(screenshot_directory)
+
+        self.set_synchronization(synchronization, synchronization_timeout)
+
+    def clear_element_cache(self):
+        """Clears the cache of elements found on the current screen.
+
+        The cache is cleared automatically when the screen changes, see `Element cache`. Use this keyword when the
+        screen is changed by something outside of this library.
+        """
+        self._invalidate_element_cache(screen_data=True)
 
     def click_element(self, element_id):
         """Performs a single click on a given element. Used only for buttons, tabs and menu items.
@@ -64,14 +236,15 @@ class SapGuiLibrary:
         element_type = self.get_element_type(element_id)
         if (element_type == "GuiTab"
                 or element_type == "GuiMenu"):
-            self.session.findById(element_id).select()
+            self._get_element(element_id).select()
         elif element_type == "GuiButton":
-            self.session.findById(element_id).press()
+            self._get_element(element_id).press()
         else:
             self.take_screenshot()
             message = "You cannot use 'click_element' on element type '%s', maybe use 'select checkbox' instead?" % element_type
             raise Warning(message)
-        time.sleep(self.explicit_wait)
+        self._invalidate_element_cache()
+        self._synchronize(server=True)
 
     def click_toolbar_button(self, table_id, button_id):
         """Clicks a button of a toolbar within a GridView 'table_id' which is contained within a shell object.
@@ -80,66 +253,101 @@ class SapGuiLibrary:
         self.element_should_be_present(table_id)
 
         try:
-            self.session.findById(table_id).pressToolbarButton(button_id)
+            self._get_element(table_id).pressToolbarButton(button_id)
         except AttributeError:
             self.take_screenshot()
-            self.session.findById(table_id).pressButton(button_id)
+            self._get_element(table_id).pressButton(button_id)
         except com_error:
             self.take_screenshot()
             message = "Cannot find Button_id '%s'." % button_id
             raise ValueError(message)
-        time.sleep(self.explicit_wait)
+        self._invalidate_element_cache()
+        self._synchronize(server=True)
 
     def connect_to_existing_connection(self, connection_name):
         """Connects to an open connection. If the connection matches the given connection_name, the session is connected
         to this connection.
+
+        All open connections are searched, see `Multiple connections and sessions`.
         """
-        self.connection = self.sapapp.Children(0)
-        if self.connection.Description == connection_name:
-            self.session = self.connection.children(0)
+        entry = self._find_registered_session(connection_name)
+        if entry is None or entry["description"] != connection_name:
+            # The name may also be the alias or system of another session, read all connections once more
+            self._refresh_session_registry(full=True)
+            entry = self.session_registry.find(connection_name)
+        if entry is not None and entry["description"] == connection_name:
+            self.connection = entry["connection"]
+            self.session = entry["session"]
+            self._invalidate_element_cache(screen_data=True)
+            self._connect_session_events()
         else:
             self.take_screenshot()
             message = "No existing connection for '%s' found." % connection_name
             raise ValueError(message)
 
-    def connect_to_session(self, explicit_wait=0):
+    def connect_to_session(self, explicit_wait=0, instance=0):
         """Connects to an open session SAP.
 
         See `Opening a connection / Before running tests` for details about requirements before connecting to a session.
 
         Optionally `set explicit wait` can be used to set the explicit wait time.
 
+        The scripting engine that is found is reused by later calls, as long as it is still alive. When multiple Sap
+        Logon Pads are running, 'instance' selects the Sap Logon Pad by the order in which they are registered,
+        starting from 0.
+
         *Examples*:
         | *Keyword*             | *Attributes*          |
         | connect to session    |                       |
         | connect to session    | 3                     |
         | connect to session    | explicit_wait=500ms   |
+        | connect to session    | instance=1            |
 
         """
-        lenstr = len("SAPGUI")
-        rot = pythoncom.GetRunningObjectTable()
-        rotenum = rot.EnumRunning()
-        while True:
-            monikers = rotenum.Next()
-            if not monikers:
-                break
-            ctx = pythoncom.CreateBindCtx(0)
-            name = monikers[0].GetDisplayName(ctx, None);
-
-            if name[-lenstr:] == "SAPGUI":
-                obj = rot.GetObject(monikers[0])
-                sapgui = win32com.client.Dispatch(obj.QueryInterface(pythoncom.IID_IDispatch))
-                self.sapapp = sapgui.GetScriptingEngine
-                # Set explicit_wait after connection succeed
-                self.set_explicit_wait(explicit_wait)
+        start_time = time.time()
+        engine = self.backend.get_scripting_engine(int(instance))
+        logger.debug("Searching the Sap scripting engine took %.3f seconds." % (time.time() - start_time))
+        if engine is not None:
+            if self.instrumentation is not None:
+                engine = self.instrumentation.wrap(engine)
+            self.sapapp = engine
+            # Set explicit_wait after connection succeed
+            self.set_explicit_wait(explicit_wait)
 
         if hasattr(self.sapapp, "OpenConnection") == False:
             self.take_screenshot()
             message = "Could not connect to Session, is Sap Logon Pad open?"
             raise Warning(message)
         # run explicit wait last
+        self._invalidate_element_cache()
         time.sleep(self.explicit_wait)
 
+    def create_session_pool(self, size=6, timeout=30):
+        """Creates a pool of 'size' sessions on the current connection, see `Session pool`. Sessions that are already
+        open are part of the pool, missing sessions are created. 'timeout' is the maximum time to wait for each new
+        session and can be given in the same formats as `set explicit wait`.
+
+        *Examples*:
+        | Create Session Pool |                   |
+        | Create Session Pool | 4                 |
+        | Create Session Pool | size=6            | timeout=1 min |
+        """
+        if not hasattr(self.connection, "Children"):
+            self.take_screenshot()
+            message = "Cannot create a session pool without an open connection, use 'open connection' first."
+            raise Warning(message)
+        try:
+            self.session_pool = SessionPool(self.connection, int(size), self._convert_time(timeout))
+        except com_error:
+            self.take_screenshot()
+            message = "Cannot create a session pool of %s sessions." % size
+            raise ValueError(message)
+        except RuntimeError as error:
+            self.take_screenshot()
+            message = "Cannot create a session pool of %s sessions: %s" % (size, error)
+            raise Warning(message)
+        logger.info("Created a session pool of %s sessions." % size)
+
     def disable_screenshots_on_error(self):
         """Disables automatic screenshots on error.
         """
@@ -152,18 +360,19 @@ class SapGuiLibrary:
         # Performing the correct method on an element, depending on the type of element
         element_type = self.get_element_type(element_id)
         if element_type == "GuiShell":
-            self.session.findById(element_id).doubleClickItem(item_id, column_id)
+            self._get_element(element_id).doubleClickItem(item_id, column_id)
         else:
             self.take_screenshot()
             message = "You cannot use 'doubleclick element' on element type '%s', maybe use 'click element' instead?" % element_type
             raise Warning(message)
-        time.sleep(self.explicit_wait)
+        self._invalidate_element_cache()
+        self._synchronize(server=True)
 
     def element_should_be_present(self, element_id, message=None):
         """Checks whether an element is present on the screen.
         """
         try:
-            self.session.findById(element_id)
+            self._get_element(element_id)
         except com_error:
             self.take_screenshot()
             if message is None:
@@ -194,8 +403,9 @@ class SapGuiLibrary:
                 or element_type == "GuiTitlebar"
                 or element_type == "GuiButton"
                 or element_type == "GuiLabel"):
-            self.session.findById(element_id).setfocus()
-            time.sleep(self.explicit_wait)
+            if self._get_snapshot_record(element_id) is None:
+                self._get_element(element_id).setfocus()
+                self._synchronize()
             # In these cases we can simply check the text value against the value of the element
             if expected_value != actual_value:
                 if message is None:
@@ -213,7 +423,8 @@ class SapGuiLibrary:
         elif (element_type == "GuiCheckBox"
               or element_type == "GuiRadioButton"):
             # First check if there is a correct value given, otherwise raise an assertion error
-            self.session.findById(element_id).setfocus()
+            if self._get_snapshot_record(element_id) is None:
+                self._get_element(element_id).setfocus()
             if (expected_value.lower() != "checked"
                     and expected_value.lower() != "unchecked"):
                 # Raise an AsertionError when no correct expected_value is given
@@ -234,7 +445,7 @@ class SapGuiLibrary:
             message = "Cannot use keyword 'element value should be' for element type '%s'" % element_type
             raise Warning(message)
         # Run explicit wait as last
-        time.sleep(self.explicit_wait)
+        self._synchronize()
 
     def element_value_should_contain(self, element_id, expected_value, message=None):
         """Checks whether the element value contains the expected value.
@@ -257,9 +468,12 @@ class SapGuiLibrary:
                 or element_type == "GuiTitlebar"
                 or element_type == "GuiButton"
                 or element_type == "GuiLabel"):
-            self.session.findById(element_id).setfocus()
-            actual_value = self.get_value(element_id)
-            time.sleep(self.explicit_wait)
+            if self._get_snapshot_record(element_id) is None:
+                self._get_element(element_id).setfocus()
+                actual_value = self.get_value(element_id)
+                self._synchronize()
+            else:
+                actual_value = self.get_value(element_id)
             # In these cases we can simply check the text value against the value of the element
             if expected_value not in actual_value:
                 self.take_screenshot()
@@ -273,59 +487,424 @@ class SapGuiLibrary:
             message = "Cannot use keyword 'element value should contain' for element type '%s'" % element_type
             raise Warning(message)
         # Run explicit wait as last
-        time.sleep(self.explicit_wait)
+        self._synchronize()
+
+    def element_values_should_be(self, expected_values, message=None):
+        """Checks the values of multiple elements at once. 'expected_values' is a dictionary with element_id: expected
+        value pairs, the possible expected values are the same as for `element value should be`.
+
+        The values are read without focusing the elements, from the screen snapshot when one was taken with
+        `take screen snapshot`. All elements are checked and a single error listing every mismatch is raised, with a
+        single screenshot.
+
+        *Example:*
+        | ${expected}=             | Create Dictionary | wnd[0]/usr/txtNAME=John | wnd[0]/usr/chkACTIVE=checked |
+        | Element Values Should Be | ${expected}       |                         |                              |
+        """
+        mismatches = []
+        for element_id, expected_value in expected_values.items():
+            found_id = self._find_element_id(element_id)
+            if found_id is None:
+                mismatches.append("Cannot find element with locator '%s'" % element_id)
+                continue
+            try:
+                element_type, actual_value = self._read_value(found_id)
+            except com_error:
+                mismatches.append("Cannot find element with id '%s'" % found_id)
+                continue
+            if actual_value is None:
+                mismatches.append("Cannot check value of '%s' with element type '%s'" % (element_id, element_type))
+            elif element_type in SELECTABLE_TYPES:
+                if str(expected_value).lower() != actual_value:
+                    mismatches.append("Element value of '%s' should be '%s', but was '%s'" % (
+                        element_id, expected_value, actual_value))
+            elif expected_value != actual_value:
+                mismatches.append("Element value of '%s' should be '%s', but was '%s'" % (
+                    element_id, expected_value, actual_value))
+
+        if mismatches:
+            self.take_screenshot()
+            if message is None:
+                message = "%s of %s element values didn't match:\n%s" % (
+                    len(mismatches), len(expected_values), "\n".join(mismatches))
+            raise AssertionError(message)
 
     def enable_screenshots_on_error(self):
         """Enables automatic screenshots on error.
         """
         self.take_screenshots = True
 
+    def export_table(self, table_id, path, columns=None, file_format=None, first_row=0, last_row=None,
+                     flush_interval=1000, progress_interval=10000):
+        """Exports the rows of a GridView or a TableControl 'table_id' to a CSV or JSONL file and returns the number of
+        exported rows.
+
+        The rows are read page by page and written to the file directly, so the memory usage does not depend on the
+        size of the table. The 'file_format' (csv or jsonl) is taken from the extension of 'path' when it is not given.
+        'columns', 'first_row' and 'last_row' limit the exported data, see `get table data`. The file is flushed every
+        'flush_interval' rows and the progress is logged every 'progress_interval' rows.
+
+        For a TableControl the column names are the names of the cells in the first visible row.
+
+        *Examples*:
+        | ${count}= | Export Table | wnd[0]/usr/cntlGRID1/shellcont/shell      | ${OUTPUT DIR}/report.csv  |              |
+        | ${count}= | Export Table | wnd[0]/usr/tblSAPMV45ATCTRL_U_ERF_AUFTRAG | ${OUTPUT DIR}/items.jsonl | last_row=999 |
+        """
+        self.element_should_be_present(table_id)
+        element_type = self.get_element_type(table_id)
+        if element_type == "GuiTableControl":
+            all_columns = get_table_control_columns(self._get_element(table_id))
+        else:
+            try:
+                all_columns = get_grid_columns(self._get_element(table_id))
+            except (AttributeError, com_error):
+                self.take_screenshot()
+                message = "Cannot use keyword 'export table' for element type '%s'" % element_type
+                raise ValueError(message)
+
+        columns = to_column_list(columns) or all_columns
+        for column in columns:
+            if column not in all_columns:
+                self.take_screenshot()
+                message = "Cannot find Column_id '%s'." % column
+                raise ValueError(message)
+
+        last_row = None if last_row is None else int(last_row)
+        if element_type == "GuiTableControl":
+            rows = iter_table_control_rows(lambda: self._find_scrolled_element(table_id),
+                                           [all_columns.index(column) for column in columns], int(first_row), last_row)
+        else:
+            rows = iter_grid_rows(self._get_element(table_id), columns, int(first_row), last_row)
+
+        progress_interval = int(progress_interval)
+        start_time = time.time()
+        with RowWriter(path, columns, file_format, flush_interval) as writer:
+            for row_num, values in rows:
+                writer.write(dict(zip(columns, values)))
+                if progress_interval > 0 and writer.count % progress_interval == 0:
+                    logger.info("Exported %s rows of table '%s'." % (writer.count, table_id))
+        logger.info("Exported %s rows of table '%s' to '%s' in %.1f seconds." % (
+            writer.count, table_id, path, time.time() - start_time))
+        return writer.count
+
+    def fill_form(self, fields):
+        """Fills multiple elements of the current screen at once. 'fields' is a dictionary with element_id: value pairs.
+
+        The action is chosen based on the type of each element:
+        | *Element type*                     | *Action*                                   | *Possible values*           |
+        | textfield, ctextfield              | `input text`                               | text                        |
+        | passwordfield                      | `input password`, not recorded in the log  | password                    |
+        | checkbox                           | `select checkbox` or `unselect checkbox`   | checked / unchecked         |
+        | combobox                           | `select from list by label`                | text of the option          |
+        | radiobutton                        | `select radio button`                      | checked                     |
+
+        The library synchronizes once after all elements are filled and a single summary is logged. Elements that
+        cannot be filled don't stop the other elements from being filled, all failures are reported together
+        afterwards.
+
+        *Example:*
+        | ${fields}= | Create Dictionary | wnd[0]/usr/txtNAME=John | wnd[0]/usr/chkACTIVE=checked |
+        | Fill Form  | ${fields}         |                         |                              |
+        """
+        filled = []
+        failures = []
+        for element_id, value in fields.items():
+            found_id = self._find_element_id(element_id)
+            if found_id is None:
+                failures.append("Cannot find element with locator '%s'" % element_id)
+                continue
+            try:
+                element_type = self._get_element_type(element_id)
+                element = self._get_element(element_id)
+                if element_type in ("GuiTextField", "GuiCTextField"):
+                    element.text = value
+                    filled.append("%s='%s'" % (element_id, value))
+                elif element_type == "GuiPasswordField":
+                    element.text = value
+                    filled.append("%s=*****" % element_id)
+                elif element_type in ("GuiCheckBox", "GuiRadioButton"):
+                    selected = str(value).lower()
+                    if selected not in ("checked", "unchecked") or (
+                            element_type == "GuiRadioButton" and selected == "unchecked"):
+                        failures.append("Incorrect value '%s' for element '%s' of type '%s'" % (
+                            value, element_id, element_type))
+                        continue
+                    element.selected = selected == "checked"
+                    filled.append("%s=%s" % (element_id, selected))
+                elif element_type == "GuiComboBox":
+                    element.value = value
+                    filled.append("%s='%s'" % (element_id, value))
+                else:
+                    failures.append("Cannot fill element '%s' of type '%s'" % (element_id, element_type))
+            except com_error:
+                failures.append("Cannot fill element with id '%s'" % found_id)
+
+        logger.info("Filled %s of %s fields: %s" % (len(filled), len(fields), ", ".join(filled)))
+        self._invalidate_element_cache()
+        self._synchronize()
+
+        if failures:
+            self.take_screenshot()
+            message = "Cannot fill %s field(s): %s" % (len(failures), "; ".join(failures))
+            raise ValueError(message)
+
+    def find_element(self, locator):
+        """Returns the ID of the element found with the given locator, see `Locating or specifying elements`. An ID is
+        returned as it is.
+
+        *Examples*:
+        | ${id}= | Find Element | label=Material |
+        | ${id}= | Find Element | tooltip=Save (Ctrl+S) |
+        """
+        return self._resolve_element_id(locator)
+
+    def find_table_row(self, table_id, match="equals", use_index=True, **criteria):
+        """Returns the number of the first row of a GridView or TableControl 'table_id' that matches all given column
+        criteria. Fails when no row matches.
+
+        See `find table rows` for the possible arguments. The returned row number can be used directly with
+        `select table row` or `get cell value`.
+
+        *Examples*:
+        | ${row}= | Find Table Row | wnd[0]/usr/cntlGRID1/shellcont/shell | MATNR=100-100 | WERKS=1000     |
+        | ${row}= | Find Table Row | wnd[0]/usr/cntlGRID1/shellcont/shell | MAKTX=Pump    | match=contains |
+        | Select Table Row | wnd[0]/usr/cntlGRID1/shellcont/shell | ${row} |              |                |
+        """
+        rows = self.find_table_rows(table_id, match, use_index, **criteria)
+        if not rows:
+            self.take_screenshot()
+            message = "No row found in table '%s' where %s" % (
+                table_id, ", ".join("%s %s '%s'" % (column, match, value) for column, value in sorted(criteria.items())))
+            raise ValueError(message)
+        return rows[0]
+
+    def find_table_rows(self, table_id, match="equals", use_index=True, **criteria):
+        """Returns the numbers of all rows of a GridView or TableControl 'table_id' that match all given column
+        criteria. The criteria are given as column_id=value pairs.
+
+        'match' defines how values are compared: equals (default), contains or regex. Only the columns used in the
+        criteria are read from the table. The column values and an index of the values are kept until the screen
+        changes, a transaction is started or the table is modified with `set cell value`, also after actions like
+        `select table row`, so repeated lookups on the same screen don't read the table again. Set 'use_index' to
+        False to always read the table, for example after refreshing it.
+
+        *Examples*:
+        | ${rows}= | Find Table Rows | wnd[0]/usr/cntlGRID1/shellcont/shell | WERKS=1000       |             |
+        | ${rows}= | Find Table Rows | wnd[0]/usr/cntlGRID1/shellcont/shell | MATNR=^100-     | match=regex |
+        """
+        match = str(match).lower()
+        if match not in ("equals", "contains", "regex"):
+            message = "Unknown match '%s', use equals, contains or regex" % match
+            raise ValueError(message)
+        if not criteria:
+            message = "Provide at least one column criterion, like MATNR=100-100"
+            raise ValueError(message)
+        use_index = str(use_index).lower() not in ("false", "no", "off", "0")
+
+        columns = sorted(criteria)
+        values = self._get_column_values(table_id, columns, use_index)
+        rows = None
+        for column in columns:
+            if match == "equals" and use_index:
+                index_key = ("column_index", table_id, column)
+                if index_key not in self.element_cache.screen_data:
+                    self.element_cache.screen_data[index_key] = build_value_index(values[column])
+                matching_rows = self.element_cache.screen_data[index_key].get(criteria[column], [])
+            else:
+                matching_rows = match_rows(values[column], criteria[column], match)
+            rows = set(matching_rows) if rows is None else rows.intersection(matching_rows)
+        return sorted(rows)
+
     def get_cell_value(self, table_id, row_num, col_id):
         """Returns the cell value for the specified cell.
         """
         self.element_should_be_present(table_id)
 
         try:
-            cellValue = self.session.findById(table_id).getCellValue(row_num, col_id)
+            cellValue = self._get_element(table_id).getCellValue(row_num, col_id)
             return cellValue
         except com_error:
             self.take_screenshot()
             message = "Cannot find Column_id '%s'." % col_id
             raise ValueError(message)
 
+    def get_element_cache_statistics(self, reset=False):
+        """Returns a dictionary with the statistics of the element cache: the number of cache hits and misses, the hit
+        ratio, the number of elements currently cached and the number of times the cache was invalidated.
+
+        When 'reset' is set to True, the counters are reset after they have been returned.
+
+        *Example:*
+        | ${stats}= | Get Element Cache Statistics |            |
+        | Log       | ${stats}[hits]               |            |
+        """
+        statistics = self.element_cache.statistics()
+        if reset:
+            self.element_cache.reset_statistics()
+        return statistics
+
     def get_element_location(self, element_id):
         """Returns the Sap element location for the given element.
         """
+        record = self._get_snapshot_record(element_id)
+        if record is not None:
+            return record["left"], record["top"]
         self.element_should_be_present(element_id)
-        screenleft = self.session.findById(element_id).screenLeft
-        screentop = self.session.findById(element_id).screenTop
+        screenleft = self._get_element(element_id).screenLeft
+        screentop = self._get_element(element_id).screenTop
         return screenleft, screentop
 
     def get_element_type(self, element_id):
         """Returns the Sap element type for the given element.
         """
+        record = self._get_snapshot_record(element_id)
+        if record is not None:
+            return record["type"]
+        element_id = self._resolve_element_id(element_id)
         try:
-            type = self.session.findById(element_id).type
-            return type
+            return self._get_element_type(element_id)
         except com_error:
             self.take_screenshot()
             message = "Cannot find element with id '%s'" % element_id
             raise ValueError(message)
 
+    def get_instrumentation_statistics(self, reset=False):
+        """Returns a list with the statistics of every keyword and screen that called Sap Gui, see `Instrumentation`.
+        Each row is a dictionary with the scope (keyword or screen), name, number of invocations, number of COM calls
+        (method calls, property gets and property sets), COM time, server wait, sleep time, total time and the members
+        that were used the most. Rows are ordered by total time, the slowest first.
+
+        When 'reset' is set to True, the statistics are cleared after they have been returned.
+
+        *Example:*
+        | ${rows}= | Get Instrumentation Statistics |                    |
+        | Log      | ${rows}[0][name]               |                    |
+        """
+        if self.instrumentation is None:
+            message = "Instrumentation is not enabled, use the 'instrumentation' import argument."
+            raise Warning(message)
+        statistics = self.instrumentation.statistics()
+        if reset:
+            self.instrumentation.reset()
+        return statistics
+
+    def get_response_time_statistics(self, reset=False):
+        """Returns a list with the server response times per transaction and screen, see `Response times`. Each row is
+        a dictionary with the transaction, program, screen, the number of steps, the percentiles and maximum of the
+        response time and interpretation time in milliseconds, and the mean number of round trips and flushes.
+
+        When 'reset' is set to True, the recorded steps are cleared after the statistics have been returned.
+
+        *Example:*
+        | ${rows}= | Get Response Time Statistics |                               |
+        | Log      | ${rows}[0][response_time_p95] |                              |
+        """
+        if self.response_times is None:
+            message = "Response times are not recorded, use the 'response_times' import argument."
+            raise Warning(message)
+        statistics = self.response_times.statistics()
+        if reset:
+            self.response_times.reset()
+        return statistics
+
     def get_row_count(self, table_id):
         """Returns the number of rows found in the specified table.
         """
         self.element_should_be_present(table_id)
-        rowCount = self.session.findById(table_id).rowCount
+        rowCount = self._get_element(table_id).rowCount
         return rowCount
 
     def get_scroll_position(self, element_id):
         """Returns the scroll position of the scrollbar of an element 'element_id' that is contained within a shell object.
         """
         self.element_should_be_present(element_id)
-        currentPosition = self.session.findById(element_id).verticalScrollbar.position
+        currentPosition = self._get_element(element_id).verticalScrollbar.position
         return currentPosition
 
+    def get_session_event_log(self):
+        """Returns the events received from the Sap session as a list of dictionaries with the keys 'timestamp',
+        'event' and 'details'. Events are only received when the synchronization mode is set to events, see
+        `Synchronization`.
+        """
+        if self._event_sink is None:
+            return []
+        return list(self._event_sink.events)
+
+    def get_session_pool_statistics(self):
+        """Returns a dictionary with the statistics of the session pool: the size, the number of leased sessions, the
+        number of leases and reuses, the total, maximum and average wait time for a lease in seconds and the
+        utilization (the fraction of time sessions were leased).
+        """
+        self._session_pool_should_exist()
+        return self.session_pool.statistics()
+
+    def get_session_registry(self):
+        """Returns a list with a dictionary per open session, with the keys 'id', 'description', 'system', 'client',
+        'user' and 'aliases'. See `Multiple connections and sessions`.
+        """
+        self._refresh_session_registry()
+        return self.session_registry.overview()
+
+    def get_table_data(self, table_id, columns=None, first_row=0, last_row=None, orientation="rows"):
+        """Returns the cell values of a GridView 'table_id' which is contained within a shell object.
+
+        The column metadata is read once and the rows are read page by page, so rows that are loaded lazily by the
+        GridView are loaded as well. Use 'columns' (a list or a comma separated string of column ids) to read only
+        specific columns and 'first_row' and 'last_row' (both inclusive, starting from 0) to read a range of rows.
+
+        With orientation 'rows' (default) a list with a dictionary per row is returned. With orientation 'columns' a
+        dictionary is returned with a list of values per column.
+
+        *Examples*:
+        | ${rows}=    | Get Table Data | wnd[0]/usr/cntlGRID1/shellcont/shell |                     |             |
+        | ${rows}=    | Get Table Data | wnd[0]/usr/cntlGRID1/shellcont/shell | columns=MATNR,MENGE | last_row=99 |
+        | ${columns}= | Get Table Data | wnd[0]/usr/cntlGRID1/shellcont/shell | orientation=columns |             |
+        """
+        orientation = str(orientation).lower()
+        if orientation not in ("rows", "columns"):
+            message = "Unknown orientation '%s', use rows or columns" % orientation
+            raise ValueError(message)
+
+        self.element_should_be_present(table_id)
+        grid = self._get_element(table_id)
+        try:
+            all_columns = get_grid_columns(grid)
+        except (AttributeError, com_error):
+            self.take_screenshot()
+            message = "Cannot use keyword 'get table data' for element '%s', it is not a GridView" % table_id
+            raise ValueError(message)
+
+        columns = to_column_list(columns) or all_columns
+        for column in columns:
+            if column not in all_columns:
+                self.take_screenshot()
+                message = "Cannot find Column_id '%s'." % column
+                raise ValueError(message)
+
+        last_row = None if last_row is None else int(last_row)
+        rows = iter_grid_rows(grid, columns, int(first_row), last_row)
+        if orientation == "columns":
+            data = dict((column, []) for column in columns)
+            for row_num, values in rows:
+                for column, value in zip(columns, values):
+                    data[column].append(value)
+            return data
+        return [dict(zip(columns, values)) for row_num, values in rows]
+
+    def get_tree_data(self, tree_id):
+        """Reads all nodes of the tree 'tree_id' at once and returns them in tree order as a list of dictionaries with
+        the key, text, parent key, children keys, folder and expanded state, level and path of each node.
+
+        The nodes are kept until the screen changes, also after selecting nodes, so `select node` and
+        `select node link` can find nodes by a path of node texts without reading the tree again. Collapsed folders
+        are not expanded by this keyword; their children are loaded when a path leads through them.
+
+        *Example:*
+        | ${nodes}= | Get Tree Data | wnd[0]/usr/cntlTREE/shellcont/shell |
+        | Log       | ${nodes}[0][path] |                                |
+        """
+        return self._get_tree_index(tree_id, reread=True).rows()
+
     def get_value(self, element_id):
         """Gets the value of the given element. The possible return values depend on the type of element (see Return values).
 
@@ -341,6 +920,12 @@ class SapGuiLibrary:
         | guistatusbar     | text                              |
         | guitab           | text                              |
         """
+        snapshot = self.element_cache.data.get("snapshot")
+        if snapshot is not None:
+            return_value = snapshot.value(self._resolve_element_id(element_id))
+            if return_value is not None:
+                return return_value
+
         element_type = self.get_element_type(element_id)
         return_value = ""
         if (element_type == "GuiTextField"
@@ -352,19 +937,19 @@ class SapGuiLibrary:
                 or element_type == "GuiTab"
                 or element_type == "GuiShell"):
             self.set_focus(element_id)
-            return_value = self.session.findById(element_id).text
+            return_value = self._get_element(element_id).text
         elif element_type == "GuiStatusPane":
-            return_value = self.session.findById(element_id).text
+            return_value = self._get_element(element_id).text
         elif (element_type == "GuiCheckBox"
               or element_type == "GuiRadioButton"):
-            actual_value = self.session.findById(element_id).selected
+            actual_value = self._get_element(element_id).selected
             # In these situations we return check / unchecked, so we change these values here
             if actual_value == True:
                 return_value = "checked"
             elif actual_value == False:
                 return_value = "unchecked"
         elif element_type == "GuiComboBox":
-            return_value = self.session.findById(element_id).text
+            return_value = self._get_element(element_id).text
             # In comboboxes there are many spaces after the value. In order to check the value, we strip them away.
             return_value = return_value.strip()
         else:
@@ -379,7 +964,7 @@ class SapGuiLibrary:
         """
         return_value = ""
         try:
-            return_value = self.session.findById(locator).text
+            return_value = self._get_element(locator).text
         except com_error:
             self.take_screenshot()
             message = "Cannot find window with locator '%s'" % locator
@@ -396,9 +981,10 @@ class SapGuiLibrary:
                 or element_type == "GuiCTextField"
                 or element_type == "GuiShell"
                 or element_type == "GuiPasswordField"):
-            self.session.findById(element_id).text = password
+            self._get_element(element_id).text = password
+            self.element_cache.data.pop("snapshot", None)
             logger.info("Typing password into text field '%s'." % element_id)
-            time.sleep(self.explicit_wait)
+            self._synchronize()
         else:
             self.take_screenshot()
             message = "Cannot use keyword 'input password' for element type '%s'" % element_type
@@ -413,27 +999,53 @@ class SapGuiLibrary:
                 or element_type == "GuiCTextField"
                 or element_type == "GuiShell"
                 or element_type == "GuiPasswordField"):
-            self.session.findById(element_id).text = text
+            self._get_element(element_id).text = text
+            self.element_cache.data.pop("snapshot", None)
             logger.info("Typing text '%s' into text field '%s'." % (text, element_id))
-            time.sleep(self.explicit_wait)
+            self._synchronize()
         else:
             self.take_screenshot()
             message = "Cannot use keyword 'input text' for element type '%s'" % element_type
             raise ValueError(message)
 
+    def lease_session(self, index=None, timeout=None):
+        """Leases a free session of the session pool and makes it the session all keywords work on. Returns the index
+        of the leased session within the pool.
+
+        With 'index' a specific session of the pool is leased. When no session is free the keyword waits for one,
+        at most 'timeout' when given. Use `release session` to return the session to the pool.
+        """
+        self._session_pool_should_exist()
+        if self._leased_index is not None:
+            message = "Session %s is still leased, use 'release session' first." % self._leased_index
+            raise Warning(message)
+        if timeout is not None:
+            timeout = self._convert_time(timeout)
+        index = None if index is None else int(index)
+        try:
+            self._leased_index, session = self.session_pool.lease(index, timeout)
+        except RuntimeError as error:
+            self.take_screenshot()
+            raise AssertionError(str(error))
+        self._session_before_lease = self.session
+        self.session = session
+        self._invalidate_element_cache(screen_data=True)
+        self._connect_session_events()
+        return self._leased_index
+
     def maximize_window(self, window=0):
         """Maximizes the SapGui window.
         """
         try:
-            self.session.findById("wnd[%s]" % window).maximize()
-            time.sleep(self.explicit_wait)
+            self._get_element("wnd[%s]" % window).maximize()
+            self._synchronize()
         except com_error:
             self.take_screenshot()
             message = "Cannot maximize window wnd[% s], is the window actually open?" % window
             raise ValueError(message)
 
         # run explicit wait last
-        time.sleep(self.explicit_wait)
+        self._synchronize()
 
     def open_connection(self, connection_name):
         """Opens a connection to the given connection name. Be sure to provide the full connection name, including the bracket part.
@@ -452,19 +1064,127 @@ class SapGuiLibrary:
             raise ValueError(message)
         self.session = self.connection.children(0)
         # run explicit wait last
-        time.sleep(self.explicit_wait)
+        self._invalidate_element_cache(screen_data=True)
+        self._connect_session_events()
+        self._synchronize()
+
+    def read_transaction_data_in_parallel(self, items, transaction, read_ids, input_id=None, vkey=0, sessions=2,
+                                          timeout=30):
+        """Reads data for a list of work items with a transaction, spread over multiple sessions of the current
+        connection. Returns a list with a dictionary per item, in the same order as 'items'.
+
+        For every item the transaction is started, the item is entered into element 'input_id' and virtual key 'vkey'
+        is sent (see `send vkey`). Then the values of the elements in 'read_ids' and the text of the status bar (key
+        'status') are read. An item can also be a dictionary with element_id: value pairs, then 'input_id' is not
+        needed. Items that cannot be read get a dictionary with the key 'error'.
+
+        The items are divided over 'sessions' sessions of the session pool, each driven from its own thread. The pool
+        is created when it doesn't exist yet, see `Session pool`. The active session is never used, so it stays on
+        its current screen. The used sessions are returned to the start screen afterwards.
+
+        *Example:*
+        | @{materials}= | Create List                       | 100-100      | 100-200 | 100-300   |
+        | @{fields}=    | Create List                       | wnd[0]/usr/txtMAKTX  | wnd[0]/usr/ctxtMEINS |   |
+        | ${results}=   | Read Transaction Data In Parallel | ${materials} | MM03    | ${fields} |
+        | ...           | input_id=wnd[0]/usr/ctxtRMMG1-MATNR | sessions=3 |         |           |
+        """
+        sessions = int(sessions)
+        timeout = self._convert_time(timeout)
+        if self.session_pool is None:
+            self.create_session_pool(sessions + 1, timeout)
+
+        active_index = self.session_pool.index_of(self.session)
+        indexes = [index for index in self.session_pool.free_indexes() if index != active_index][:sessions]
+        if not indexes:
+            self.take_screenshot()
+            message = "No free session in the session pool to read the data with."
+            raise Warning(message)
+
+        leased = [self.session_pool.lease(index, timeout)[1] for index in indexes]
+        recipe = ReadRecipe(transaction, read_ids, input_id, vkey, timeout)
+        start_time = time.time()
+        try:
+            results = read_in_parallel(leased, items, recipe, self.backend)
+        finally:
+            for index in indexes:
+                try:
+                    self.session_pool.release(index)
+                except com_error:
+                    logger.warn("Cannot reset session %s of the session pool, it is returned to the pool as it is."
+                                % index)
+        logger.info("Read %s items with %s sessions in %.1f seconds." % (len(results), len(indexes),
+                                                                          time.time() - start_time))
+        return results
+
+    def release_session(self, reset=True):
+        """Returns the leased session to the session pool, see `lease session`. The session is navigated to the start
+        screen first, unless 'reset' is False. The session that was active before the lease becomes active again.
+        """
+        self._session_pool_should_exist()
+        if self._leased_index is None:
+            message = "No session is leased, use 'lease session' first."
+            raise Warning(message)
+        reset = str(reset).lower() not in ("false", "no", "off", "0")
+        index = self._leased_index
+        try:
+            self.session_pool.release(index, reset)
+        except com_error:
+            self.take_screenshot()
+            message = "Cannot reset session %s of the session pool, it is returned to the pool as it is." % index
+            raise ValueError(message)
+        finally:
+            self._leased_index = None
+            self.session = self._session_before_lease
+            self._session_before_lease = None
+            self._invalidate_element_cache(screen_data=True)
+            self._connect_session_events()
+
+    def replay_recording(self, path, **parameters):
+        """Replays a script recorded with the Sap Gui script recorder (a .vbs file) on the current session and returns
+        the number of replayed lines.
+
+        Lines like session.findById("wnd[0]/usr/txtNAME").text = "John" and session.findById("wnd[0]").sendVKey 0
+        are replayed, also when members are chained like in .getAbsoluteRow(0).selected = true. Values and arguments
+        must be literals (strings, numbers, True or False); lines with variables or expressions cannot be replayed.
+        The lines that connect to Sap Gui are skipped, because the current session is used. Elements found before on
+        the same screen are reused, see `Element cache`. After every method that may go to the server, like sendVKey
+        and press, the library waits until the session is idle instead of applying the explicit wait.
+
+        Values and element ids in the script can contain parameters as ${name}, which are replaced by the named
+        arguments given to this keyword.
+
+        *Example:*
+        | Replay Recording | ${CURDIR}/create_material.vbs | material=100-100 | industry=M |
+        """
+        operations = parse_recording(read_recording(path))
+        start_time = time.time()
+        for number, element_id, chain, member, arguments, is_property in operations:
+            try:
+                element_id = substitute(element_id, parameters)
+                chain = [(name, None if values is None else [substitute(value, parameters) for value in values])
+                         for name, values in chain]
+                arguments = [substitute(argument, parameters) for argument in arguments]
+                self._replay_operation(element_id, chain, member, arguments, is_property)
+            except (AttributeError, ValueError, AssertionError, com_error) as error:
+                self.take_screenshot()
+                message = "Line %s of '%s' failed: %s" % (number, path, error)
+                raise ValueError(message)
+        logger.info("Replayed %s lines of '%s' in %.1f seconds." % (len(operations), path, time.time() - start_time))
+        return len(operations)
 
     def run_transaction(self, transaction):
         """Runs a Sap transaction. An error is given when an unknown transaction is specified.
         """
-        self.session.findById("wnd[0]/tbar[0]/okcd").text = transaction
-        time.sleep(self.explicit_wait)
+        self._get_element("wnd[0]/tbar[0]/okcd").text = transaction
+        self._synchronize()
+        # A transaction that is started again has the same program and screen number, but new data
+        self.element_cache.screen_data = {}
         self.send_vkey(0)
 
         if transaction == '/nex':
             return
 
-        pane_value = self.session.findById("wnd[0]/sbar/pane[0]").text
+        pane_value = self._get_element("wnd[0]/sbar/pane[0]").text
         if pane_value in ("Transactie %s bestaat niet" % transaction.upper(),
                           "Transaction %s does not exist" % transaction.upper(),
                           "Transaktion %s existiert nicht" % transaction.upper()):
@@ -472,13 +1192,85 @@ class SapGuiLibrary:
             message = "Unknown transaction: '%s'" % transaction
             raise ValueError(message)
 
+    def run_transaction_with_data(self, transaction, steps, input_file, result_file, file_format=None,
+                                  progress_interval=100, fail_on_error=True):
+        """Runs a transaction once for every row of a CSV or JSONL file, executing the same 'steps' for each row, and
+        returns a dictionary with the number of rows, passed and failed rows, the duration and the rows per minute.
+        The transaction can be given as XD01 or as a command like /nXD01.
+
+        Each step is a string 'action | element id | value' (or a list with these items), where the value can refer
+        to the columns of the row as {column}. Element ids can also be locators, see `Locating or specifying elements`.
+        | *Action*  | *Does*                                                                  |
+        | input     | Sets the text of the element to the value                               |
+        | select    | Selects a check box or radio button, or the key 'value' of a combo box  |
+        | unselect  | Removes the selection of a check box                                    |
+        | focus     | Sets the focus to the element                                           |
+        | press     | Presses a button or selects a tab                                       |
+        | vkey      | Sends virtual key 'value' to the window 'element id', see `send vkey`   |
+
+        The rows are read one at a time and the steps are executed without the overhead of a keyword per step. Only
+        starting the transaction, 'press' and 'vkey' steps go to the server, after each of them the library waits
+        until the session is idle instead of applying the explicit wait. After the last step the text and message
+        type of the status bar are read.
+
+        For every row a result is written to 'result_file' right away: the columns of the row and status (PASS or
+        FAIL), message_type, message, error and duration. A row fails when a step fails or the status bar shows an
+        error (E) or abort (A) message; open popups are then cancelled and the next row is run. The progress is
+        logged every 'progress_interval' rows. When 'fail_on_error' is True, the keyword fails after all rows have
+        been run when one or more rows failed.
+
+        *Example:*
+        | @{steps}= | Create List | input \\| wnd[0]/usr/ctxtRF02D-KUNNR \\| {customer} | vkey \\| wnd[0] \\| 0 |
+        | ...       | input \\| label=Name \\| {name} | press \\| tooltip=Save (Ctrl+S) |  |
+        | ${stats}= | Run Transaction With Data | XD01 | ${steps} | ${CURDIR}/customers.csv | ${OUTPUT DIR}/result.csv |
+        """
+        template = TransactionTemplate(transaction, steps)
+        progress_interval = int(progress_interval)
+        result_columns = ["status", "message_type", "message", "error", "duration"]
+        writer = None
+        passed = failed = 0
+        start_time = time.time()
+        try:
+            for row in iter_rows(input_file, file_format):
+                if writer is None:
+                    writer = RowWriter(result_file, list(row) + result_columns, flush_interval=1)
+                result = self._run_template_row(template, row)
+                if result["status"] == "PASS":
+                    passed += 1
+                else:
+                    failed += 1
+                    logger.info("Row %s failed: %s" % (passed + failed, result["error"] or result["message"]))
+                writer.write(dict(row, **result))
+                if progress_interval > 0 and (passed + failed) % progress_interval == 0:
+                    logger.info("Ran %s rows of transaction %s, %s failed." % (passed + failed, transaction, failed))
+        finally:
+            if writer is not None:
+                writer.close()
+
+        duration = time.time() - start_time
+        statistics = {
+            "rows": passed + failed,
+            "passed": passed,
+            "failed": failed,
+            "duration": round(duration, 3),
+            "rows_per_minute": round((passed + failed) * 60.0 / duration, 1) if duration else 0.0,
+        }
+        logger.info("Ran %s rows of transaction %s in %.1f seconds (%s rows per minute), %s failed." % (
+            statistics["rows"], transaction, duration, statistics["rows_per_minute"], failed))
+        if failed and fail_on_error:
+            self.take_screenshot()
+            message = "%s of %s rows failed, see '%s'." % (failed, statistics["rows"], result_file)
+            raise AssertionError(message)
+        return statistics
+
     def scroll(self, element_id, position):
         """Scrolls the scrollbar of an element 'element_id' that is contained within a shell object.
         'Position' is the number of rows to scroll.
         """
         self.element_should_be_present(element_id)
-        self.session.findById(element_id).verticalScrollbar.position = position
-        time.sleep(self.explicit_wait)
+        self._get_element(element_id).verticalScrollbar.position = position
+        self._invalidate_element_cache()
+        self._synchronize()
 
     def select_checkbox(self, element_id):
         """Selects checkbox identified by locator.
@@ -486,12 +1278,13 @@ class SapGuiLibrary:
         """
         element_type = self.get_element_type(element_id)
         if element_type == "GuiCheckBox":
-            self.session.findById(element_id).selected = True
+            self._get_element(element_id).selected = True
         else:
             self.take_screenshot()
             message = "Cannot use keyword 'select checkbox' for element type '%s'" % element_type
             raise ValueError(message)
-        time.sleep(self.explicit_wait)
+        self._invalidate_element_cache()
+        self._synchronize()
 
     def select_context_menu_item(self, element_id, menu_or_button_id, item_id):
         """Selects an item from the context menu by clicking a button or right-clicking in the node context menu.
@@ -499,26 +1292,28 @@ class SapGuiLibrary:
         self.element_should_be_present(element_id)
 
         # The function checks if the element has an attribute "nodeContextMenu" or "pressContextButton"
-        if hasattr(self.session.findById(element_id), "nodeContextMenu"):
-            self.session.findById(element_id).nodeContextMenu(menu_or_button_id)
-        elif hasattr(self.session.findById(element_id), "pressContextButton"):
-            self.session.findById(element_id).pressContextButton(menu_or_button_id)
+        if hasattr(self._get_element(element_id), "nodeContextMenu"):
+            self._get_element(element_id).nodeContextMenu(menu_or_button_id)
+        elif hasattr(self._get_element(element_id), "pressContextButton"):
+            self._get_element(element_id).pressContextButton(menu_or_button_id)
         # The element has neither attributes, give an error message
         else:
             self.take_screenshot()
             element_type = self.get_element_type(element_id)
             message = "Cannot use keyword 'select context menu item' for element type '%s'" % element_type
             raise ValueError(message)
-        self.session.findById(element_id).selectContextMenuItem(item_id)
-        time.sleep(self.explicit_wait)
+        self._get_element(element_id).selectContextMenuItem(item_id)
+        self._invalidate_element_cache()
+        self._synchronize(server=True)
 
     def select_from_list_by_label(self, element_id, value):
         """Selects the specified option from the selection list.
         """
         element_type = self.get_element_type(element_id)
         if element_type == "GuiComboBox":
-            self.session.findById(element_id).value = value
-            time.sleep(self.explicit_wait)
+            self._get_element(element_id).value = value
+            self._invalidate_element_cache()
+            self._synchronize()
         else:
             self.take_screenshot()
             message = "Cannot use keyword 'select from list by label' for element type '%s'" % element_type
@@ -527,40 +1322,59 @@ class SapGuiLibrary:
     def select_node(self, tree_id, node_id, expand=False):
         """Selects a node of a TableTreeControl 'tree_id' which is contained within a shell object.
 
-        Use the Scripting tracker recorder to find the 'node_id' of the node.
+        Use the Scripting tracker recorder to find the 'node_id' of the node, or give the path of node texts
+        separated by slashes, like Sales/Orders/Create. A top node can be given as /Sales. Paths are resolved from the
+        nodes read with `get tree data`, which is done automatically when needed.
         Expand can be set to True to expand the node. If the node cannot be expanded, no error is given.
+
+        *Examples*:
+        | Select Node | wnd[0]/usr/cntlTREE/shellcont/shell | 0000000012          |             |
+        | Select Node | wnd[0]/usr/cntlTREE/shellcont/shell | Sales/Orders/Create | expand=True |
         """
         self.element_should_be_present(tree_id)
-        self.session.findById(tree_id).selectedNode = node_id
+        node_id = self._resolve_tree_node(tree_id, node_id)
+        self._get_element(tree_id).selectedNode = node_id
         if expand:
             #TODO: elegantere manier vinden om dit af te vangen
             try:
-                self.session.findById(tree_id).expandNode(node_id)
+                self._get_element(tree_id).expandNode(node_id)
             except com_error:
                 pass
-        time.sleep(self.explicit_wait)
+            else:
+                index = self.element_cache.screen_data.get(("tree_index", tree_id))
+                if index is not None and node_id in index.nodes:
+                    try:
+                        index.expanded(node_id)
+                    except com_error:
+                        del self.element_cache.screen_data[("tree_index", tree_id)]
+        self._invalidate_element_cache()
+        self._synchronize(server=True)
 
     def select_node_link(self, tree_id, link_id1, link_id2):
         """Selects a link of a TableTreeControl 'tree_id' which is contained within a shell object.
 
-        Use the Scripting tracker recorder to find the 'link_id1' and 'link_id2' of the link to select.
+        Use the Scripting tracker recorder to find the 'link_id1' and 'link_id2' of the link to select. 'link_id1'
+        can also be a path of node texts, see `select node`.
         """
         self.element_should_be_present(tree_id)
-        self.session.findById(tree_id).selectItem(link_id1, link_id2)
-        self.session.findById(tree_id).clickLink(link_id1, link_id2)
-        time.sleep(self.explicit_wait)
+        link_id1 = self._resolve_tree_node(tree_id, link_id1)
+        self._get_element(tree_id).selectItem(link_id1, link_id2)
+        self._get_element(tree_id).clickLink(link_id1, link_id2)
+        self._invalidate_element_cache()
+        self._synchronize(server=True)
 
     def select_radio_button(self, element_id):
         """Sets radio button to the specified value.
         """
         element_type = self.get_element_type(element_id)
         if element_type == "GuiRadioButton":
-            self.session.findById(element_id).selected = True
+            self._get_element(element_id).selected = True
         else:
             self.take_screenshot()
             message = "Cannot use keyword 'select radio button' for element type '%s'" % element_type
             raise ValueError(message)
-        time.sleep(self.explicit_wait)
+        self._invalidate_element_cache()
+        self._synchronize()
 
     def select_table_column(self, table_id, column_id):
         """Selects an entire column of a GridView 'table_id' which is contained within a shell object.
@@ -569,12 +1383,13 @@ class SapGuiLibrary:
         """
         self.element_should_be_present(table_id)
         try:
-            self.session.findById(table_id).selectColumn(column_id)
+            self._get_element(table_id).selectColumn(column_id)
         except com_error:
             self.take_screenshot()
             message = "Cannot find Column_id '%s'." % column_id
             raise ValueError(message)
-        time.sleep(self.explicit_wait)
+        self._invalidate_element_cache()
+        self._synchronize()
 
     def select_table_row(self, table_id, row_num):
         """Selects an entire row of a table. This can either be a TableControl or a GridView 'table_id'
@@ -582,16 +1397,17 @@ class SapGuiLibrary:
         """
         element_type = self.get_element_type(table_id)
         if (element_type == "GuiTableControl"):
-            id = self.session.findById(table_id).getAbsoluteRow(row_num)
+            id = self._get_element(table_id).getAbsoluteRow(row_num)
             id.selected = -1
         else:
             try:
-                self.session.findById(table_id).selectedRows = row_num
+                self._get_element(table_id).selectedRows = row_num
             except com_error:
                 self.take_screenshot()
                 message = "Cannot use keyword 'select table row' for element type '%s'" % element_type
                 raise ValueError(message)
-        time.sleep(self.explicit_wait)
+        self._invalidate_element_cache()
+        self._synchronize()
 
     def send_vkey(self, vkey_id, window=0):
         """Sends a SAP virtual key combination to the window, not into an element.
@@ -667,12 +1483,13 @@ class SapGuiLibrary:
                     raise ValueError(message)
 
         try:
-            self.session.findById("wnd[% s]" % window).sendVKey(vkey_id)
+            self._get_element("wnd[% s]" % window).sendVKey(vkey_id)
         except com_error:
             self.take_screenshot()
             message = "Cannot send Vkey to given window, is window wnd[% s] actually open?" % window
             raise ValueError(message)
-        time.sleep(self.explicit_wait)
+        self._invalidate_element_cache()
+        self._synchronize(server=True)
 
     def set_cell_value(self, table_id, row_num, col_id, text):
         """Sets the cell value for the specified cell of a GridView 'table_id' which is contained within a shell object.
@@ -682,14 +1499,74 @@ class SapGuiLibrary:
         self.element_should_be_present(table_id)
 
         try:
-            self.session.findById(table_id).modifyCell(row_num, col_id, text)
+            self._get_element(table_id).modifyCell(row_num, col_id, text)
+            self._clear_table_index(table_id)
             logger.info("Typing text '%s' into cell '%s', '%s'" % (text, row_num, col_id))
-            time.sleep(self.explicit_wait)
+            self._synchronize()
         except com_error:
             self.take_screenshot()
             message = "Cannot type text '%s' into cell '%s', '%s'" % (text, row_num, col_id)
             raise ValueError(message)
 
+    def set_cell_values(self, table_id, cells, first_row=0):
+        """Sets the values of multiple cells of a GridView 'table_id' which is contained within a shell object.
+
+        'cells' is either a list of (row, column, value) items or a list of dictionaries with column_id: value pairs
+        per row. The row of a dictionary is taken from its 'row' key or, when it has none, from its position in the
+        list starting from 'first_row'.
+
+        The GridView is looked up once, all cells are written in one pass and 'triggerModified' is called once at the
+        end. Cells that cannot be set don't stop the other cells from being set, all failures are reported together
+        afterwards.
+
+        *Examples*:
+        | ${cell1}=       | Create List                          | 0         | MENGE       | 10       |
+        | ${cell2}=       | Create List                          | 1         | MENGE       | 25       |
+        | ${cells}=       | Create List                          | ${cell1}  | ${cell2}    |          |
+        | Set Cell Values | wnd[0]/usr/cntlGRID1/shellcont/shell | ${cells}  |             |          |
+        | ${row}=         | Create Dictionary                    | MATNR=100 | MENGE=10    |          |
+        | ${rows}=        | Create List                          | ${row}    |             |          |
+        | Set Cell Values | wnd[0]/usr/cntlGRID1/shellcont/shell | ${rows}   | first_row=4 |          |
+        """
+        self.element_should_be_present(table_id)
+        grid = self._get_element(table_id)
+
+        updates = []
+        for position, cell in enumerate(cells):
+            if isinstance(cell, dict):
+                cell = dict(cell)
+                row_num = int(cell.pop("row", position + int(first_row)))
+                updates.extend((row_num, column, value) for column, value in cell.items())
+            else:
+                row_num, column, value = cell
+                updates.append((int(row_num), column, value))
+
+        failures = []
+        for row_num, column, value in updates:
+            try:
+                grid.modifyCell(row_num, column, value)
+            except com_error:
+                failures.append("'%s' into cell '%s', '%s'" % (value, row_num, column))
+
+        triggered = False
+        if len(failures) < len(updates):
+            try:
+                grid.triggerModified()
+                triggered = True
+            except (AttributeError, com_error):
+                pass
+        self._clear_table_index(table_id)
+        logger.info("Typed %s of %s values into table '%s'." % (len(updates) - len(failures), len(updates), table_id))
+        if triggered:
+            # triggerModified goes to the server, which may change the screen
+            self._invalidate_element_cache()
+        self._synchronize(server=triggered)
+
+        if failures:
+            self.take_screenshot()
+            message = "Cannot type %s value(s): %s" % (len(failures), "; ".join(failures))
+            raise ValueError(message)
+
     def set_explicit_wait(self, speed):
         """Sets the delay time that is waited after each SapGui keyword.
 
@@ -710,6 +1587,241 @@ class SapGuiLibrary:
         | Set explicit wait | 3 seconds         |
         | Set explicit wait | 500 ms            |
         """
+        self.explicit_wait = self._convert_time(speed)
+
+    def set_focus(self, element_id):
+
+        """Sets the focus to the given element.
+        """
+        element_type = self.get_element_type(element_id)
+        if element_type != "GuiStatusPane":
+            self._get_element(element_id).setFocus()
+        self._synchronize()
+
+    def set_session_alias(self, alias, session=None):
+        """Sets an alias for a session, that can be used with `switch session`. Without 'session' the alias is set for
+        the active session, otherwise for the session found with the given identifier, see
+        `Multiple connections and sessions`.
+
+        *Examples*:
+        | Set Session Alias | DEV                 |                 |
+        | Set Session Alias | QA                  | session=QA1/100 |
+        """
+        if session is None:
+            try:
+                session_id = self.session.Id
+            except (AttributeError, com_error):
+                message = "No active session to set alias '%s' for, use 'connect to session' first." % alias
+                raise Warning(message)
+        else:
+            entry = self._find_registered_session(session)
+            if entry is None:
+                self.take_screenshot()
+                message = "No session found for '%s'." % session
+                raise ValueError(message)
+            session_id = entry["id"]
+        self.session_registry.set_alias(alias, session_id)
+
+    def set_synchronization(self, mode, timeout=None):
+        """Sets the synchronization mode that is used after each action, see `Synchronization`.
+
+        'mode' is explicit, idle or events. The optional 'timeout' is the maximum time to wait for the session to become
+        idle and can be given in the same formats as `set explicit wait`.
+
+         *Example:*
+        | *Keyword*           | *Attributes*      |                   |
+        | Set synchronization | idle              |                   |
+        | Set synchronization | idle              | timeout=1 min     |
+        | Set synchronization | events            |                   |
+        | Set synchronization | explicit          |                   |
+        """
+        mode = str(mode).lower()
+        if mode not in ("explicit", "idle", "events"):
+            message = "Unknown synchronization mode '%s', use explicit, idle or events" % mode
+            raise ValueError(message)
+        self.synchronization = mode
+        if timeout is not None:
+            self.synchronization_timeout = self._convert_time(timeout)
+        self._connect_session_events()
+
+    def switch_session(self, session):
+        """Makes the session found with the given alias or identifier the active session, see
+        `Multiple connections and sessions`.
+
+        *Examples*:
+        | Switch Session | DEV             |
+        | Switch Session | QA1/100         |
+        | Switch Session | /app/con[1]/ses[0] |
+        """
+        entry = self._find_registered_session(session)
+        if entry is None:
+            self.take_screenshot()
+            message = "No session found for '%s'." % session
+            raise ValueError(message)
+        self.connection = entry["connection"]
+        self.session = entry["session"]
+        self._invalidate_element_cache(screen_data=True)
+        self._connect_session_events()
+
+    def take_screen_snapshot(self, window=0):
+        """Reads the id, type, name, text, tooltip, selected state, changeable flag and position of all elements in the user
+        area of window 'window' in a single walk and returns the number of elements read.
+
+        Until the next action, keywords that read element values answer from the snapshot, see `Screen snapshots`.
+
+        *Example:*
+        | Take Screen Snapshot    |                      |          |
+        | Element Value Should Be | wnd[0]/usr/txtNAME   | John     |
+        | Element Value Should Be | wnd[0]/usr/chkACTIVE | checked  |
+        """
+        try:
+            root = self._get_element("wnd[%s]/usr" % window)
+        except com_error:
+            self.take_screenshot()
+            message = "Cannot take a snapshot of window wnd[% s], is the window actually open?" % window
+            raise ValueError(message)
+        snapshot = ScreenSnapshot(root)
+        self.element_cache.data["snapshot"] = snapshot
+        logger.info("Snapshot of window wnd[%s] contains %s elements." % (window, len(snapshot.elements)))
+        return len(snapshot.elements)
+
+    def take_screenshot(self, screenshot_name="sap-screenshot"):
+        """Takes a screenshot, only if 'screenshots on error' has been enabled,
+        either at import of with keyword `enable screenshots on error`.
+
+        The active Sap Gui window is captured, see `Screenshots (on error)`. Without a session Robots' internal
+        `Screenshot` library is used.
+        """
+        if self.take_screenshots == True:
+            try:
+                image = capture_window(self.session.ActiveWindow)
+            except (AttributeError, TypeError, com_error):
+                self._get_screenshot_library().take_screenshot(screenshot_name)
+                return
+            self._save_screenshot(screenshot_name, image)
+
+    def unselect_checkbox(self, element_id):
+        """Removes selection of checkbox identified by locator.
+        Does nothing if the checkbox is not selected.
+        """
+        element_type = self.get_element_type(element_id)
+        if element_type == "GuiCheckBox":
+            self._get_element(element_id).selected = False
+        else:
+            self.take_screenshot()
+            message = "Cannot use keyword 'unselect checkbox' for element type '%s'" % element_type
+            raise ValueError(message)
+        self._invalidate_element_cache()
+        self._synchronize()
+
+    def wait_until_session_is_idle(self, timeout=None):
+        """Waits until the Sap session is no longer busy with a server request and its active window can be accessed.
+
+        'timeout' defaults to the synchronization timeout, see `Synchronization`. Fails when the session is still busy
+        after the timeout.
+        """
+        if timeout is None:
+            timeout = self.synchronization_timeout
+        else:
+            timeout = self._convert_time(timeout)
+
+        interval = 0.01
+        end_time = time.time() + timeout
+        while True:
+            try:
+                # The active window cannot be accessed while the session is switching screens
+                busy = self.session.Busy or self.session.ActiveWindow is None
+            except com_error:
+                # The session cannot be accessed while it is switching screens, consider it busy
+                busy = True
+            if not busy:
+                return
+            if time.time() >= end_time:
+                break
+            time.sleep(min(interval, max(end_time - time.time(), 0)))
+            interval = min(interval * 2, 0.2)
+
+        self.take_screenshot()
+        message = "Sap session is still busy after %s seconds" % timeout
+        raise AssertionError(message)
+
+    def _get_screenshot_library(self):
+        # Robot's Screenshot library is only loaded when the first screenshot is taken
+        if self._screenshot is None:
+            from robot.libraries.Screenshot import Screenshot
+            self._screenshot = Screenshot()
+            if self.screenshot_directory is not None:
+                self._screenshot.set_screenshot_directory(self.screenshot_directory)
+        return self._screenshot
+
+    def _get_screenshot_writer(self):
+        if self._screenshot_writer is None:
+            directory = self.screenshot_directory or self._get_output_directory()
+            budget = None
+            if self.screenshot_budget is not None:
+                budget = int(float(self.screenshot_budget) * 1024 * 1024)
+            self._screenshot_writer = ScreenshotWriter(directory, budget)
+        return self._screenshot_writer
+
+    def _get_output_directory(self):
+        from robot.libraries.BuiltIn import BuiltIn, RobotNotRunningError
+        try:
+            return BuiltIn().get_variable_value("${OUTPUT DIR}")
+        except RobotNotRunningError:
+            return os.getcwd()
+
+    def _save_screenshot(self, name, image):
+        from robot.utils import get_link_path
+        writer = self._get_screenshot_writer()
+        path, new = writer.submit(name, image)
+        if path is None:
+            if writer.dropped == 1:
+                logger.warn("The screenshot budget of %s MB is used, no more screenshots are saved."
+                            % self.screenshot_budget)
+            return
+        if not new:
+            logger.info("Screenshot is identical to an earlier screenshot.")
+        link = get_link_path(path, self._get_output_directory())
+        logger.info('<a href="%s"><img src="%s" width="800px"></a>' % (link, link), html=True)
+
+    def _start_keyword(self, name, attributes):
+        # Listener method: the screen signature is checked again at the start of every keyword
+        self._screen_validated = False
+        self._keyword_name = name
+        self._step_start = time.time()
+        if self.instrumentation is not None:
+            self.instrumentation.start_keyword(name, self._get_screen_name())
+
+    def _end_keyword(self, name, attributes):
+        if self.instrumentation is not None:
+            self.instrumentation.end_keyword(self._get_screen_name())
+
+    def _end_suite(self, name, attributes):
+        if self._screenshot_writer is not None:
+            self._screenshot_writer.flush()
+        if self.instrumentation is not None:
+            logger.info("Sap Gui instrumentation:\n%s" % self.instrumentation.summary())
+            self.instrumentation.write(self.instrumentation_file)
+        if self.response_times is not None:
+            self.response_times.write(self.response_times_file)
+        if self.latency_profile is not None:
+            self.latency_profile.save()
+
+    def _close(self):
+        if self._screenshot_writer is not None:
+            self._screenshot_writer.flush()
+        if self.instrumentation is not None:
+            self.instrumentation.write(self.instrumentation_file)
+        if self.response_times is not None:
+            self.response_times.write(self.response_times_file)
+        if self.latency_profile is not None:
+            self.latency_profile.save()
+
+    def _convert_time(self, speed):
+        """Converts a number of seconds or a human-readable time string like 700 ms to seconds.
+        """
+        if isinstance(speed, (int, float)):
+            return float(speed)
         speed = str(speed)
         if not speed.isdigit():
             speed_elements = speed.split()
@@ -724,53 +1836,391 @@ class SapGuiLibrary:
                         or speed_elements[1] == "s"
                         or speed_elements[1] == "secs"
                         or speed_elements[1] == "sec"):
-                    self.explicit_wait = speed_elements[0]
+                    return speed_elements[0]
                 elif (speed_elements[1] == "minutes"
                       or speed_elements[1] == "minute"
                       or speed_elements[1] == "mins"
                       or speed_elements[1] == "min"
                       or speed_elements[1] == "m"):
-                    self.explicit_wait = speed_elements[0] * 60
+                    return speed_elements[0] * 60
                 elif (speed_elements[1] == "milliseconds"
                       or speed_elements[1] == "millisecond"
                       or speed_elements[1] == "millis"
                       or speed_elements[1] == "ms"):
-                    self.explicit_wait = speed_elements[0] / 1000
+                    return speed_elements[0] / 1000
                 else:
                     self.take_screenshot()
                     message = "%s is a unknown time format" % speed_elements[1]
                     raise ValueError(message)
         else:
             # No timeformat given, so time is expected to be given in seconds
-            self.explicit_wait = float(speed)
+            return float(speed)
 
-    def set_focus(self, element_id):
+    def _synchronize(self, server=False):
+        """Waits after an action, depending on the synchronization mode. 'server' is True for actions that go to the
+        server, only these are recorded as steps for the response times and the latency profile.
+        """
+        step = self._get_step()
+        timeout = self.synchronization_timeout
+        if step is not None and self.latency_profile is not None:
+            timeout = self.latency_profile.timeout(step, timeout)
+        with measure(self.instrumentation, "server_wait"):
+            if self.synchronization == "idle":
+                self.wait_until_session_is_idle(timeout)
+            elif self.synchronization == "events":
+                self._wait_for_end_request(timeout)
+        duration = time.time() - self._step_start
+        with measure(self.instrumentation, "sleep_time"):
+            time.sleep(self.explicit_wait)
+        # The counters of the session only change after a server interaction, other actions would repeat them
+        if server:
+            if self.response_times is not None or self.latency_profile is not None:
+                self._record_step(step, duration)
+        self._step_start = time.time()
+
+    def _get_step(self):
+        """Returns the transaction, program and screen number the running action started on, and the keyword, or
+        None when the screen is not known. The screen is the one read after the previous step of the same session.
+        """
+        if self._step_screen is None or self._step_screen[0] is not self.session:
+            return None
+        return self._step_screen[1] + (self._keyword_name,)
 
-        """Sets the focus to the given element.
+    def _record_step(self, step, duration):
+        try:
+            info = read_session_info(self.session)
+        except (AttributeError, com_error):
+            self._step_screen = None
+            return
+        self._step_screen = (self.session, (info["transaction"], info["program"], info["screen"]))
+        # The screen is known now, so the element cache does not have to ask for it again
+        self.element_cache.validate((info["program"], info["screen"]))
+        self._screen_validated = True
+
+        if self.response_times is not None:
+            info["action"] = self._keyword_name
+            self.response_times.record(info)
+            logger.debug("Server response time %s ms, %s round trip(s) for %s screen %s/%s"
+                         % (info["response_time"], info["round_trips"], info["transaction"], info["program"],
+                            info["screen"]))
+        if self.latency_profile is not None and step is not None:
+            baseline = self.latency_profile.add(step, duration)
+            if baseline is not None:
+                logger.warn("Slow step: '%s' on %s screen %s/%s took %.3f seconds, its baseline is %.3f seconds."
+                            % (step[3], step[0], step[1], step[2], duration, baseline))
+
+    def _connect_session_events(self):
+        """Connects an event sink to the current session in events synchronization. This is done as soon as the
+        session is set, so the request of the first action on the session is observed too.
         """
-        element_type = self.get_element_type(element_id)
-        if element_type != "GuiStatusPane":
-            self.session.findById(element_id).setFocus()
-        time.sleep(self.explicit_wait)
+        if self.synchronization != "events" or (self._event_sink is not None and self._event_session is self.session):
+            return
+        try:
+            self._event_sink = connect_session_events(self.session, self.backend)
+        except (AttributeError, com_error):
+            # No session yet, it is connected when the session is set or at the first wait
+            return
+        self._event_session = self.session
+        self._event_requests = self._event_sink.requests
+
+    def _wait_for_end_request(self, timeout=None):
+        if self._event_sink is None or self._event_session is not self.session:
+            self._event_sink = connect_session_events(self.session, self.backend)
+            self._event_session = self.session
+            self._event_requests = self._event_sink.requests
+
+        if timeout is None:
+            timeout = self.synchronization_timeout
+        sink = self._event_sink
+        if not sink.wait_for_end_request(timeout, self.backend.pump_messages):
+            self.take_screenshot()
+            message = "Sap session did not end its request within %s seconds" % timeout
+            raise AssertionError(message)
+        if sink.aborted:
+            sink.aborted = False
+            self.take_screenshot()
+            message = "Scripting was aborted by the Sap session"
+            raise AssertionError(message)
+        if sink.requests != self._event_requests:
+            self._event_requests = sink.requests
+            logger.debug("Server request took %.3f seconds" % sink.last_server_time)
+
+    def _get_element(self, element_id):
+        """Returns the element for the given id, using the element cache of the current screen.
+        """
+        if not self._screen_validated:
+            self._validate_element_cache()
+        element_id = self._resolve_element_id(element_id)
+        entry = self.element_cache.get(element_id)
+        if entry is not None:
+            return entry[0]
+        element = self.session.findById(element_id)
+        self.element_cache.put(element_id, element)
+        return element
+
+    def _clear_table_index(self, table_id):
+        for key in list(self.element_cache.screen_data):
+            if key[0] in ("column_values", "column_index") and key[1] == table_id:
+                del self.element_cache.screen_data[key]
+
+    def _get_column_values(self, table_id, columns, use_cache=True):
+        """Returns a dictionary with a list of all values per column of a GridView or TableControl. Only the columns
+        that are not cached yet are read from the table, in a single pass. The values are kept until the screen
+        changes or the table is modified with `set cell value` or `set cell values`.
+        """
+        if not self._screen_validated:
+            self._validate_element_cache()
+        values = {}
+        if use_cache:
+            for column in columns:
+                key = ("column_values", table_id, column)
+                if key in self.element_cache.screen_data:
+                    values[column] = self.element_cache.screen_data[key]
+        missing = [column for column in columns if column not in values]
+        if not missing:
+            return values
 
-    def take_screenshot(self, screenshot_name="sap-screenshot"):
-        """Takes a screenshot, only if 'screenshots on error' has been enabled,
-        either at import of with keyword `enable screenshots on error`.
+        self.element_should_be_present(table_id)
+        element_type = self.get_element_type(table_id)
+        try:
+            if element_type == "GuiTableControl":
+                all_columns = get_table_control_columns(self._get_element(table_id))
+            else:
+                all_columns = get_grid_columns(self._get_element(table_id))
+        except (AttributeError, com_error):
+            self.take_screenshot()
+            message = "Cannot read columns of element type '%s'" % element_type
+            raise ValueError(message)
+        for column in missing:
+            if column not in all_columns:
+                self.take_screenshot()
+                message = "Cannot find Column_id '%s'." % column
+                raise ValueError(message)
 
-        This keyword uses Robots' internal `Screenshot` library.
+        if element_type == "GuiTableControl":
+            rows = iter_table_control_rows(lambda: self._find_scrolled_element(table_id),
+                                           [all_columns.index(column) for column in missing])
+        else:
+            rows = iter_grid_rows(self._get_element(table_id), missing)
+        read_values = dict((column, []) for column in missing)
+        for row_num, row_values in rows:
+            for column, value in zip(missing, row_values):
+                read_values[column].append(value)
+
+        for column in missing:
+            values[column] = read_values[column]
+            self.element_cache.screen_data[("column_values", table_id, column)] = read_values[column]
+        return values
+
+    def _get_tree_index(self, tree_id, reread=False):
+        """Returns the nodes of a tree. They are read once per screen and kept after actions like `select node`,
+        unless 'reread' is True.
         """
-        if self.take_screenshots == True:
-            self.screenshot.take_screenshot(screenshot_name)
+        self.element_should_be_present(tree_id)
+        index = self.element_cache.screen_data.get(("tree_index", tree_id))
+        if index is not None and not reread:
+            # The proxy of the tree may have been replaced after a server round trip
+            index.tree = self._get_element(tree_id)
+            return index
+        try:
+            index = TreeIndex(self._get_element(tree_id))
+        except (AttributeError, com_error):
+            self.take_screenshot()
+            message = "Cannot read the nodes of element '%s', is it a tree?" % tree_id
+            raise ValueError(message)
+        self.element_cache.screen_data[("tree_index", tree_id)] = index
+        return index
 
-    def unselect_checkbox(self, element_id):
-        """Removes selection of checkbox identified by locator.
-        Does nothing if the checkbox is not selected.
+    def _resolve_tree_node(self, tree_id, node_id):
+        """Returns the key of the node with the given path of node texts. Node keys are returned as they are.
         """
-        element_type = self.get_element_type(element_id)
-        if element_type == "GuiCheckBox":
-            self.session.findById(element_id).selected = False
-        else:
+        if "/" not in node_id:
+            return node_id
+        cached = ("tree_index", tree_id) in self.element_cache.screen_data
+        index = self._get_tree_index(tree_id)
+        if node_id in index.nodes:
+            return node_id
+        key = index.find_path(node_id)
+        if key is None and cached:
+            # The nodes of the tree may have changed since they were read
+            key = self._get_tree_index(tree_id, reread=True).find_path(node_id)
+        if key is None:
             self.take_screenshot()
-            message = "Cannot use keyword 'unselect checkbox' for element type '%s'" % element_type
+            message = "Cannot find node '%s' in tree '%s'." % (node_id, tree_id)
             raise ValueError(message)
-        time.sleep(self.explicit_wait)
+        return key
+
+    def _run_template_row(self, template, row):
+        """Runs the steps of a transaction template for a row and returns the status, status bar message and duration.
+        """
+        start_time = time.time()
+        result = {"status": "PASS", "message_type": "", "message": "", "error": ""}
+        try:
+            template.run(row, self._get_element, self._round_trip)
+            statusbar = self._get_element("wnd[0]/sbar")
+            result["message"] = statusbar.Text
+            result["message_type"] = statusbar.MessageType
+            if result["message_type"] in FAILED_MESSAGE_TYPES:
+                result["status"] = "FAIL"
+        except Exception as error:
+            # Any error only fails the row, the next rows are still run
+            result["status"] = "FAIL"
+            result["error"] = str(error)
+            try:
+                close_popups(self.session, self._round_trip)
+            except (AttributeError, AssertionError, com_error):
+                pass
+        result["duration"] = round(time.time() - start_time, 3)
+        return result
+
+    def _replay_operation(self, element_id, chain, member, arguments, is_property):
+        """Sets a property or calls a method of an element, or of the object reached from the element through the
+        chain of (name, arguments) members. A cached element that no longer exists, because the screen changed
+        without the library knowing it, is looked up again once.
+        """
+        cached = element_id in self.element_cache.elements
+        try:
+            element = self._get_element(element_id)
+            for name, values in chain:
+                element = getattr(element, name) if values is None else getattr(element, name)(*values)
+            if is_property:
+                setattr(element, member, arguments[0])
+            elif member.lower() in CLIENT_METHODS:
+                getattr(element, member)(*arguments)
+            else:
+                self._round_trip(lambda: getattr(element, member)(*arguments))
+        except com_error:
+            if not cached:
+                raise
+            self._invalidate_element_cache()
+            self._replay_operation(element_id, chain, member, arguments, is_property)
+
+    def _round_trip(self, action):
+        """Performs an action that goes to the server and waits until the session is idle.
+        """
+        self._invalidate_element_cache()
+        action()
+        self.wait_until_session_is_idle()
+
+    def _find_scrolled_element(self, element_id):
+        """Finds an element again after scrolling, which rebuilds the screen.
+        """
+        self._invalidate_element_cache()
+        self._synchronize()
+        return self._get_element(element_id)
+
+    def _read_value(self, element_id):
+        """Returns the type and the value of an element without focusing it. The value is None when it cannot be read
+        for the type of element.
+        """
+        element_id = self._resolve_element_id(element_id)
+        record = self._get_snapshot_record(element_id)
+        if record is not None:
+            return record["type"], self.element_cache.data["snapshot"].value(element_id)
+
+        element_type = self._get_element_type(element_id)
+        element = self._get_element(element_id)
+        if element_type in SELECTABLE_TYPES:
+            return element_type, "checked" if element.selected else "unchecked"
+        if element_type == "GuiComboBox":
+            return element_type, element.text.strip()
+        if element_type in TEXT_TYPES:
+            return element_type, element.text
+        return element_type, None
+
+    def _refresh_session_registry(self, full=False):
+        if not hasattr(self.sapapp, "Children"):
+            self.take_screenshot()
+            message = "Could not connect to Session, is Sap Logon Pad open?"
+            raise Warning(message)
+        self.session_registry.refresh(self.sapapp, full)
+
+    def _find_registered_session(self, identifier):
+        """Finds a session in the registry. When the session is not found, the changed connections are read again,
+        and when it is still not found, all connections are read again.
+        """
+        entry = self.session_registry.find(identifier)
+        if entry is None:
+            self._refresh_session_registry()
+            entry = self.session_registry.find(identifier)
+        if entry is None:
+            self._refresh_session_registry(full=True)
+            entry = self.session_registry.find(identifier)
+        return entry
+
+    def _session_pool_should_exist(self):
+        if self.session_pool is None:
+            message = "No session pool available, use 'create session pool' first."
+            raise Warning(message)
+
+    def _get_snapshot_record(self, element_id):
+        if not self._screen_validated:
+            self._validate_element_cache()
+        snapshot = self.element_cache.data.get("snapshot")
+        if snapshot is None:
+            return None
+        return snapshot.get(self._resolve_element_id(element_id))
+
+    def _get_element_type(self, element_id):
+        element_id = self._resolve_element_id(element_id)
+        element = self._get_element(element_id)
+        element_type = self.element_cache.elements[element_id][1]
+        if element_type is None:
+            element_type = element.type
+            self.element_cache.set_type(element_id, element_type)
+        return element_type
+
+    def _resolve_element_id(self, element_id):
+        """Returns the id of the element found with a locator, using the locator index of the current screen. Element
+        ids are returned as they are.
+        """
+        found = self._find_element_id(element_id)
+        if found is None:
+            self.take_screenshot()
+            message = "Cannot find element with locator '%s'" % element_id
+            raise ValueError(message)
+        return found
+
+    def _find_element_id(self, element_id):
+        """Returns the id of the element found with a locator or None when no element matches. The locator index is
+        kept until the screen changes. When a locator is not found in an index built earlier, or the element it was
+        found at no longer exists (like after switching a tab, which keeps the program and screen number), the
+        windows are read again once.
+        """
+        locator = parse_locator(element_id)
+        if locator is None:
+            return element_id
+        if not self._screen_validated:
+            self._validate_element_cache()
+        index = self.element_cache.screen_data.get("locator_index")
+        found = index.find(*locator) if index is not None else []
+        if found and found[0] not in self.element_cache.elements:
+            try:
+                self.element_cache.put(found[0], self.session.findById(found[0]))
+            except com_error:
+                found = []
+        if not found:
+            windows = self.session.Children
+            index = LocatorIndex([windows(number) for number in reversed(range(windows.Count))])
+            self.element_cache.screen_data["locator_index"] = index
+            found = index.find(*locator)
+        return found[0] if found else None
+
+    def _get_screen_name(self):
+        # The screen of the element cache, so no extra calls to Sap Gui are needed
+        if self.element_cache.signature is None:
+            return None
+        return "%s/%s" % self.element_cache.signature
+
+    def _invalidate_element_cache(self, screen_data=False):
+        self.element_cache.clear(screen_data)
+        self._screen_validated = False
+
+    def _validate_element_cache(self):
+        try:
+            info = self.session.Info
+            signature = (info.Program, info.ScreenNumber)
+        except (AttributeError, com_error):
+            signature = None
+        self.element_cache.validate(signature)
+        self._screen_validated = True
@@ -0,0 +1,67 @@
+try:
+    from pywintypes import com_error
+except ImportError:
+    class com_error(Exception):
+        """Stand-in for pywintypes.com_error on systems without pywin32, like Linux build servers.
+        """
+
+
+def load_backend(backend):
+    """Returns the backend to use: a new `ComBackend` when 'backend' is None, an instance of the class named by a
+    'module.ClassName' string, or 'backend' itself when it is an object.
+    """
+    if backend is None:
+        return ComBackend()
+    if isinstance(backend, str):
+        module_name, class_name = backend.rsplit(".", 1)
+        module = __import__(module_name, fromlist=[class_name])
+        return getattr(module, class_name)()
+    return backend
+
+
+class ComBackend:
+    """Backend that talks to Sap Gui through COM.
+
+    pywin32 is only imported when one of the methods is used for the first time, so the library can be imported
+    and instantiated on systems without Sap Gui, for example for libdoc or a dry-run. Other backends (like a fake
+    scripting engine) implement the same methods.
+    """
+
+    def get_scripting_engine(self, instance=0, refresh=False):
+        """Returns the scripting engine of the Sap Logon Pad with the given index, or None when it is not running.
+        """
+        from .engine import get_scripting_engine
+        return get_scripting_engine(instance, refresh)
+
+    def connect_session_events(self, session, sink_class):
+        """Creates an instance of 'sink_class' that receives the events of the given session.
+        """
+        import win32com.client
+        return win32com.client.WithEvents(session, sink_class)
+
+    def pump_messages(self):
+        """Delivers waiting COM messages, like session events, to the current thread.
+        """
+        import pythoncom
+        pythoncom.PumpWaitingMessages()
+
+    def marshal(self, session):
+        """Prepares a session to be used in another thread, see `unmarshal`.
+        """
+        import pythoncom
+        return pythoncom.CoMarshalInterThreadInterfaceInStream(pythoncom.IID_IDispatch, session._oleobj_)
+
+    def unmarshal(self, marshalled):
+        """Returns a session prepared with `marshal`, to be called from the thread that uses the session.
+        """
+        import pythoncom
+        import win32com.client
+        return win32com.client.Dispatch(pythoncom.CoGetInterfaceAndReleaseStream(marshalled, pythoncom.IID_IDispatch))
+
+    def initialize_thread(self):
+        import pythoncom
+        pythoncom.CoInitialize()
+
+    def uninitialize_thread(self):
+        import pythoncom
+        pythoncom.CoUninitialize()
@@ -0,0 +1,69 @@
+import csv
+import io
+import json
+import os
+
+
+def get_file_format(path, file_format=None):
+    """Returns the file format (csv or jsonl) of the given path, based on the extension if no format is given.
+    """
+    if file_format is None:
+        file_format = os.path.splitext(path)[1].lstrip(".")
+    file_format = file_format.lower()
+    if file_format == "json":
+        file_format = "jsonl"
+    if file_format not in ("csv", "jsonl"):
+        message = "Unknown file format '%s', use csv or jsonl" % file_format
+        raise ValueError(message)
+    return file_format
+
+
+def iter_rows(path, file_format=None):
+    """Yields the rows of a CSV or JSONL file as dictionaries, one at a time, so the file is never read as a whole.
+    """
+    file_format = get_file_format(path, file_format)
+    with io.open(path, encoding="utf-8", newline="") as data_file:
+        if file_format == "csv":
+            for row in csv.DictReader(data_file):
+                yield row
+        else:
+            for line in data_file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class RowWriter:
+    """Writes rows (dictionaries) to a CSV or JSONL file one at a time, flushing every 'flush_interval' rows.
+    """
+
+    def __init__(self, path, columns, file_format=None, flush_interval=1000):
+        self.file_format = get_file_format(path, file_format)
+        self.columns = list(columns)
+        self.flush_interval = max(int(flush_interval), 1)
+        self.count = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self._file = io.open(path, "w", encoding="utf-8", newline="")
+        if self.file_format == "csv":
+            self._writer = csv.DictWriter(self._file, fieldnames=self.columns, extrasaction="ignore")
+            self._writer.writeheader()
+
+    def write(self, row):
+        if self.file_format == "csv":
+            self._writer.writerow(row)
+        else:
+            self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.count += 1
+        if self.count % self.flush_interval == 0:
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,78 @@
+class ElementCache:
+    """Cache of resolved Sap element proxies and their types, scoped to a single screen.
+
+    Every `findById` is a cross-process COM call into Sap Gui, so the library keeps the proxies it has resolved for
+    the current screen. The cache is cleared when the screen signature (program and screen number) changes or when
+    the library performs an action that may lead to a new screen.
+
+    Other screen scoped data (for example table indexes) can be stored in `data`, it is cleared together with the
+    element proxies. Data that only depends on the layout of the screen (like the locator index) can be stored in
+    `screen_data`, it is kept after actions and only cleared when the screen signature changes.
+    """
+
+    def __init__(self):
+        self.elements = {}
+        self.data = {}
+        self.signature = None
+        self.screen_data = {}
+        self.screen_signature = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def clear(self, screen_data=False):
+        """Removes all cached elements and screen data. The data in `screen_data` is only removed when 'screen_data'
+        is True, otherwise it is kept until `validate` is called with another screen signature.
+        """
+        if self.elements or self.data or (screen_data and self.screen_data):
+            self.invalidations += 1
+        self.elements = {}
+        self.data = {}
+        self.signature = None
+        if screen_data:
+            self.screen_data = {}
+            self.screen_signature = None
+
+    def validate(self, signature):
+        """Clears the cache when the given screen signature differs from the signature the cache was built for.
+        """
+        if signature != self.signature:
+            self.clear()
+            self.signature = signature
+        if signature is None or signature != self.screen_signature:
+            self.screen_data = {}
+            self.screen_signature = signature
+
+    def get(self, element_id):
+        """Returns the cached (element, type) pair for the given element id, or None if the id is not cached.
+        """
+        entry = self.elements.get(element_id)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, element_id, element, element_type=None):
+        self.elements[element_id] = (element, element_type)
+
+    def set_type(self, element_id, element_type):
+        element = self.elements[element_id][0]
+        self.elements[element_id] = (element, element_type)
+
+    def statistics(self):
+        """Returns a dictionary with the hit and miss counters of the cache.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": float(self.hits) / lookups if lookups else 0.0,
+            "size": len(self.elements),
+            "invalidations": self.invalidations,
+        }
+
+    def reset_statistics(self):
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
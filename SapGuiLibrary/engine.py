@@ -0,0 +1,54 @@
+import pythoncom
+import win32com.client
+
+from .backend import com_error
+
+# Scripting engines found before, per instance, shared by all library instances in the process
+_engines = {}
+
+
+def _discover(instance):
+    """Searches the Running Object Table for the SAPGUI entry with the given index and returns its scripting engine.
+    Stops at the first matching entry, returns None when there is none.
+    """
+    rot = pythoncom.GetRunningObjectTable()
+    rotenum = rot.EnumRunning()
+    ctx = pythoncom.CreateBindCtx(0)
+    found = 0
+    while True:
+        monikers = rotenum.Next()
+        if not monikers:
+            return None
+        name = monikers[0].GetDisplayName(ctx, None)
+        if name.endswith("SAPGUI"):
+            if found == instance:
+                obj = rot.GetObject(monikers[0])
+                sapgui = win32com.client.Dispatch(obj.QueryInterface(pythoncom.IID_IDispatch))
+                return sapgui.GetScriptingEngine
+            found += 1
+
+
+def is_alive(engine):
+    """Checks with a single call whether a scripting engine can still be used.
+    """
+    try:
+        engine.Children.Count
+        return True
+    except (AttributeError, com_error):
+        return False
+
+
+def get_scripting_engine(instance=0, refresh=False):
+    """Returns the scripting engine of the Sap Logon Pad with the given index, or None when it is not running.
+
+    The engine is cached and only searched again when the cached engine is no longer alive or 'refresh' is True.
+    """
+    engine = _engines.get(instance)
+    if engine is not None and not refresh and is_alive(engine):
+        return engine
+    engine = _discover(instance)
+    if engine is None:
+        _engines.pop(instance, None)
+    else:
+        _engines[instance] = engine
+    return engine
@@ -0,0 +1,69 @@
+import time
+from collections import deque
+
+
+class SessionEventSink:
+    """Receives the events of a GuiSession and keeps track of the server requests.
+
+    The sink is connected with `connect_session_events`. For a real Sap session the backend creates the sink and COM
+    calls the On... methods when the session fires its events. Any other session object (for example a fake session
+    used in tests) gets a plain sink passed to its `add_event_sink` method and is expected to call the same methods.
+    """
+
+    def __init__(self, max_events=1000):
+        self.events = deque(maxlen=max_events)
+        self.request_active = False
+        self.request_start = None
+        self.last_server_time = None
+        self.aborted = False
+        self.requests = 0
+
+    def OnStartRequest(self, session=None):
+        self.aborted = False
+        self.request_active = True
+        self.request_start = time.time()
+        self._log("StartRequest")
+
+    def OnEndRequest(self, session=None):
+        end = time.time()
+        if self.request_start is not None:
+            self.last_server_time = end - self.request_start
+        self.request_active = False
+        self.requests += 1
+        self._log("EndRequest", end)
+
+    def OnChange(self, session=None, component=None, command_name=None, command_parameter=None):
+        self._log("Change", details=command_name)
+
+    def OnAbortScripting(self, session=None):
+        self.aborted = True
+        self.request_active = False
+        self._log("AbortScripting")
+
+    def wait_for_end_request(self, timeout, pump):
+        """Waits until the active server request has ended, or returns immediately when no request is active.
+
+        'pump' is called while waiting so COM can deliver the events, see `ComBackend.pump_messages`.
+        Returns True when the session is idle and False when the timeout expired.
+        """
+        end_time = time.time() + timeout
+        pump()
+        while self.request_active and not self.aborted:
+            if time.time() >= end_time:
+                return False
+            time.sleep(0.001)
+            pump()
+        return True
+
+    def _log(self, name, timestamp=None, details=None):
+        self.events.append({"timestamp": timestamp or time.time(), "event": name, "details": details})
+
+
+def connect_session_events(session, backend):
+    """Connects a `SessionEventSink` to the given session and returns the sink.
+    """
+    if hasattr(session, "_oleobj_"):
+        return backend.connect_session_events(session, SessionEventSink)
+    sink = SessionEventSink()
+    session.add_event_sink(sink)
+    return sink
@@ -0,0 +1,599 @@
+"""A pure Python stand-in for the Sap Gui scripting engine, for running and measuring the library without Sap.
+
+Use it as backend of the library:
+
+| Library | SapGuiLibrary | backend=SapGuiLibrary.fake.FakeBackend |
+
+or from Python, where the latency of every COM call and of every server round trip can be simulated:
+
+| backend = FakeBackend(latency=0.001, server_latency=0.05)
+| library = SapGuiLibrary(backend=backend)
+
+Every method call and property access on a fake object is counted in `FakeStatistics`, so the number of COM round
+trips a keyword needs can be measured. Screens are built by adding elements to a session, transactions can be
+registered with a function that builds their first screen.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from .backend import com_error
+
+
+class FakeStatistics:
+    """Counts the calls and property accesses on fake objects and simulates their latency.
+    """
+
+    def __init__(self, latency=0.0, server_latency=0.0):
+        self.latency = latency
+        self.server_latency = server_latency
+        self.calls = defaultdict(int)
+        self.round_trips = 0
+        self._lock = threading.Lock()
+
+    def record(self, name):
+        with self._lock:
+            self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @property
+    def total(self):
+        return sum(self.calls.values())
+
+    def reset(self):
+        with self._lock:
+            self.calls = defaultdict(int)
+            self.round_trips = 0
+
+
+class FakeObject(object):
+    """Base class of all fake objects. Like COM, attribute names are case insensitive.
+
+    Methods of the fake are implemented as '_call_<name>', computed properties as '_get_<name>' and '_set_<name>',
+    other properties are kept in a dictionary. Every access is recorded in the statistics.
+    """
+
+    def __init__(self, statistics, **properties):
+        object.__setattr__(self, "_statistics", statistics)
+        object.__setattr__(self, "_properties", {})
+        for name, value in properties.items():
+            self._properties[name.lower()] = value
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        key = name.lower()
+        self._statistics.record(key)
+        method = getattr(type(self), "_call_" + key, None)
+        if method is not None:
+            return method.__get__(self)
+        getter = getattr(type(self), "_get_" + key, None)
+        if getter is not None:
+            return getter(self)
+        if key in self._properties:
+            return self._properties[key]
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+            return
+        key = name.lower()
+        self._statistics.record("set " + key)
+        setter = getattr(type(self), "_set_" + key, None)
+        if setter is not None:
+            setter(self, value)
+        else:
+            self._properties[key] = value
+
+
+class FakeCollection(FakeObject):
+    """A GuiCollection, items are retrieved by calling the collection with an index.
+    """
+
+    def __init__(self, statistics, items):
+        FakeObject.__init__(self, statistics)
+        self._items = list(items)
+
+    def __call__(self, index):
+        self._statistics.record("item")
+        try:
+            return self._items[int(index)]
+        except IndexError:
+            raise com_error("The enumerator of the collection cannot find an element with the specified index.")
+
+    def _get_count(self):
+        return len(self._items)
+
+    _get_length = _get_count
+
+    def _call_elementat(self, index):
+        return self._items[int(index)]
+
+    _call_item = _call_elementat
+
+
+class FakeElement(FakeObject):
+    """A generic element of a screen, identified by its id relative to the session, like 'wnd[0]/usr/txtA'.
+    """
+
+    def __init__(self, element_id, element_type, text="", name=None, container=False, **properties):
+        FakeObject.__init__(self, None, **properties)
+        self._id = element_id
+        self._session = None
+        self._properties.setdefault("type", element_type)
+        self._properties.setdefault("text", text)
+        self._properties.setdefault("name", name or element_id.rsplit("/", 1)[-1])
+        self._properties.setdefault("changeable", True)
+        self._properties.setdefault("containertype", container)
+        self._properties.setdefault("tooltip", "")
+        for position in ("screenleft", "screentop", "left", "top", "width", "height"):
+            self._properties.setdefault(position, 0)
+
+    def _attach(self, session):
+        self._session = session
+        self._statistics = session._statistics
+
+    def _get_id(self):
+        return "%s/%s" % (self._session._id, self._id)
+
+    def _get_parent(self):
+        parent_id = self._id.rsplit("/", 1)[0]
+        return self._session._elements.get(parent_id, self._session)
+
+    def _get_children(self):
+        return FakeCollection(self._statistics, self._session._children_of(self._id))
+
+    def _call_setfocus(self):
+        self._session._focus = self._id
+
+
+class FakeTextField(FakeElement):
+    def __init__(self, element_id, text="", element_type="GuiTextField", **properties):
+        FakeElement.__init__(self, element_id, element_type, text, **properties)
+
+
+class FakeCheckBox(FakeElement):
+    def __init__(self, element_id, selected=False, text="", element_type="GuiCheckBox", **properties):
+        FakeElement.__init__(self, element_id, element_type, text, selected=selected, **properties)
+
+
+class FakeRadioButton(FakeCheckBox):
+    def __init__(self, element_id, selected=False, text="", **properties):
+        FakeCheckBox.__init__(self, element_id, selected, text, element_type="GuiRadioButton", **properties)
+
+
+class FakeComboBox(FakeElement):
+    def __init__(self, element_id, value="", entries=(), **properties):
+        FakeElement.__init__(self, element_id, "GuiComboBox", value, **properties)
+        self._entries = list(entries)
+
+    def _get_value(self):
+        return self._properties["text"]
+
+    def _set_value(self, value):
+        if self._entries and value not in self._entries:
+            raise com_error("Entry '%s' not found in the list." % value)
+        self._properties["text"] = value
+
+    _set_key = _set_value
+
+
+class FakeButton(FakeElement):
+    """A button, pressing it causes a server round trip and calls 'action' with the session when given.
+    """
+
+    def __init__(self, element_id, text="", action=None, element_type="GuiButton", **properties):
+        FakeElement.__init__(self, element_id, element_type, text, **properties)
+        self._action = action
+
+    def _call_press(self):
+        self._session._round_trip(self._action)
+
+
+class FakeTab(FakeButton):
+    def __init__(self, element_id, text="", action=None, **properties):
+        FakeButton.__init__(self, element_id, text, action, element_type="GuiTab", **properties)
+
+    _call_select = FakeButton._call_press
+
+
+class FakeStatusbar(FakeElement):
+    def __init__(self, element_id="wnd[0]/sbar", **properties):
+        FakeElement.__init__(self, element_id, "GuiStatusbar", container=True, messagetype="", **properties)
+
+
+class FakeStatusPane(FakeElement):
+    """A pane of the status bar, its text is the text of the status bar.
+    """
+
+    def __init__(self, element_id="wnd[0]/sbar/pane[0]", **properties):
+        FakeElement.__init__(self, element_id, "GuiStatusPane", **properties)
+
+    def _get_text(self):
+        return self._session._elements["wnd[0]/sbar"]._properties["text"]
+
+
+class FakeWindow(FakeElement):
+    """A main window, virtual keys sent to it are handled by the session.
+    """
+
+    def __init__(self, element_id="wnd[0]", text="SAP Easy Access", **properties):
+        FakeElement.__init__(self, element_id, "GuiMainWindow", text, container=True, **properties)
+
+    def _call_sendvkey(self, vkey):
+        self._session._send_vkey(int(vkey))
+
+    def _call_maximize(self):
+        self._properties["maximized"] = True
+
+    def _call_hardcopytomemory(self, image_type="PNG"):
+        return ("%s|%s" % (self._session._info._properties["program"], self._properties["text"])).encode("utf-8")
+
+
+class FakeGridView(FakeElement):
+    """A GridView (ALV grid) with the given columns and rows, rows are dictionaries with column_id: value pairs.
+    """
+
+    def __init__(self, element_id, columns, rows=(), visible_rows=20, **properties):
+        FakeElement.__init__(self, element_id, "GuiShell", subtype="GridView", firstvisiblerow=0,
+                             visiblerowcount=visible_rows, selectedrows="", currentcellrow=-1, **properties)
+        self._columns = list(columns)
+        self._rows = [dict(row) for row in rows]
+        self._modified = False
+
+    def _get_rowcount(self):
+        return len(self._rows)
+
+    def _get_columncount(self):
+        return len(self._columns)
+
+    def _get_columnorder(self):
+        return FakeCollection(self._statistics, self._columns)
+
+    def _check_cell(self, row, column):
+        if column not in self._columns or not 0 <= int(row) < len(self._rows):
+            raise com_error("Invalid cell %s, %s" % (row, column))
+
+    def _call_getcellvalue(self, row, column):
+        self._check_cell(row, column)
+        return self._rows[int(row)].get(column, "")
+
+    def _call_modifycell(self, row, column, value):
+        self._check_cell(row, column)
+        self._rows[int(row)][column] = value
+
+    def _call_triggermodified(self):
+        self._modified = True
+        self._session._round_trip()
+
+    def _call_selectcolumn(self, column):
+        if column not in self._columns:
+            raise com_error("Invalid column %s" % column)
+        self._properties["selectedcolumns"] = column
+
+    def _call_presstoolbarbutton(self, button_id):
+        self._session._round_trip()
+
+    def _call_doubleclickcurrentcell(self):
+        self._session._round_trip()
+
+
+class FakeTree(FakeElement):
+    """A GuiTree with nodes given as (key, text, parent key) tuples, parents before their children.
+
+    Children of the keys in 'lazy' are only loaded when their folder is expanded, like trees that load their nodes
+    from the server on demand.
+    """
+
+    def __init__(self, element_id, nodes, lazy=(), **properties):
+        FakeElement.__init__(self, element_id, "GuiShell", subtype="Tree", selectednode="", **properties)
+        self._nodes = {}
+        self._order = []
+        for key, text, parent in nodes:
+            self._nodes[key] = {"text": text, "parent": parent or "", "children": [], "expanded": False}
+            self._order.append(key)
+            if parent:
+                self._nodes[parent]["children"].append(key)
+        self._lazy = set(lazy)
+
+    def _loaded(self, key):
+        parent = self._nodes[key]["parent"]
+        if not parent:
+            return True
+        if parent in self._lazy and not self._nodes[parent]["expanded"]:
+            return False
+        return self._loaded(parent)
+
+    def _check_node(self, key):
+        if key not in self._nodes or not self._loaded(key):
+            raise com_error("Node %s not found" % key)
+
+    def _call_getallnodekeys(self):
+        return FakeCollection(self._statistics, [key for key in self._order if self._loaded(key)])
+
+    def _call_getnodetextbykey(self, key):
+        self._check_node(key)
+        return self._nodes[key]["text"]
+
+    def _call_getparent(self, key):
+        self._check_node(key)
+        return self._nodes[key]["parent"]
+
+    def _call_isfolder(self, key):
+        self._check_node(key)
+        return bool(self._nodes[key]["children"])
+
+    def _call_isfolderexpanded(self, key):
+        self._check_node(key)
+        return self._nodes[key]["expanded"]
+
+    def _call_getsubnodescol(self, key):
+        self._check_node(key)
+        if not self._loaded(key) or (key in self._lazy and not self._nodes[key]["expanded"]):
+            return None
+        return FakeCollection(self._statistics, self._nodes[key]["children"])
+
+    def _call_expandnode(self, key):
+        self._check_node(key)
+        if not self._nodes[key]["children"]:
+            raise com_error("Node %s is not a folder" % key)
+        if key in self._lazy and not self._nodes[key]["expanded"]:
+            self._session._round_trip()
+        self._nodes[key]["expanded"] = True
+
+    def _set_selectednode(self, key):
+        self._check_node(key)
+        self._properties["selectednode"] = key
+
+    def _call_selectitem(self, key, item):
+        self._check_node(key)
+
+    def _call_clicklink(self, key, item):
+        self._check_node(key)
+        self._session._round_trip()
+
+
+class FakeSessionInfo(FakeObject):
+    def __init__(self, statistics, **properties):
+        defaults = {"transaction": "SESSION_MANAGER", "program": "SAPLSMTR_NAVIGATION", "screennumber": 100,
+                    "systemname": "FAK", "client": "100", "user": "TESTER", "language": "EN",
+                    "responsetime": 0, "roundtrips": 0, "flushes": 0, "interpretationtime": 0}
+        defaults.update(properties)
+        FakeObject.__init__(self, statistics, **defaults)
+
+
+class FakeSession(FakeObject):
+    """A GuiSession with a main window, an ok-code field and a status bar.
+
+    Add elements to the current screen with `add_element` and register transactions with `add_transaction`. A
+    transaction is a function that is called with the session and builds the first screen of the transaction.
+    'on_vkey' can be set to a function that is called with the session and the key when a virtual key is sent
+    without a transaction in the ok-code field.
+    """
+
+    # Plain Python attributes, not part of the simulated COM interface
+    PLAIN_ATTRIBUTES = ("transactions", "on_vkey")
+
+    def __init__(self, statistics, connection, index):
+        FakeObject.__init__(self, statistics, busy=False)
+        self._connection = connection
+        self._index = index
+        self._id = "%s/ses[%s]" % (connection._id, index)
+        self._info = FakeSessionInfo(statistics, systemname=connection._system, client=connection._client)
+        self._elements = {}
+        self._focus = None
+        self._sinks = []
+        self.transactions = {}
+        self.on_vkey = None
+        self._start_screen()
+
+    def __setattr__(self, name, value):
+        if name in self.PLAIN_ATTRIBUTES:
+            object.__setattr__(self, name, value)
+        else:
+            FakeObject.__setattr__(self, name, value)
+
+    def _start_screen(self):
+        self._elements = {}
+        for element in (FakeWindow(), FakeElement("wnd[0]/tbar[0]", "GuiToolbar", container=True),
+                        FakeTextField("wnd[0]/tbar[0]/okcd", element_type="GuiOkCodeField"),
+                        FakeElement("wnd[0]/titl", "GuiTitlebar", "SAP Easy Access"),
+                        FakeElement("wnd[0]/usr", "GuiUserArea", container=True),
+                        FakeStatusbar(), FakeStatusPane()):
+            self.add_element(element)
+
+    def add_element(self, element):
+        """Adds an element to the current screen and returns it.
+        """
+        element._attach(self)
+        self._elements[element._id] = element
+        return element
+
+    def add_transaction(self, code, build_screen):
+        self.transactions[code.upper()] = build_screen
+
+    def new_screen(self, program, screen_number, title=None):
+        """Clears the user area and sets the program and screen number, to be used when building a screen.
+        """
+        for element_id in list(self._elements):
+            if element_id.startswith("wnd[0]/usr/"):
+                del self._elements[element_id]
+        self._info._properties["program"] = program
+        self._info._properties["screennumber"] = screen_number
+        if title is not None:
+            self._elements["wnd[0]/titl"]._properties["text"] = title
+            self._elements["wnd[0]"]._properties["text"] = title
+
+    def set_status(self, text, message_type=""):
+        statusbar = self._elements["wnd[0]/sbar"]
+        statusbar._properties["text"] = text
+        statusbar._properties["messagetype"] = message_type
+
+    def add_event_sink(self, sink):
+        self._sinks.append(sink)
+
+    def _children_of(self, element_id):
+        prefix = element_id + "/"
+        return [element for child_id, element in sorted(self._elements.items())
+                if child_id.startswith(prefix) and "/" not in child_id[len(prefix):]]
+
+    def _round_trip(self, action=None):
+        for sink in self._sinks:
+            sink.OnStartRequest(self)
+        start = time.time()
+        if self._statistics.server_latency:
+            time.sleep(self._statistics.server_latency)
+        self.set_status("")
+        if action is not None:
+            action(self)
+        elapsed = int((time.time() - start) * 1000)
+        info = self._info._properties
+        info["responsetime"] = elapsed
+        info["roundtrips"] = 1
+        info["flushes"] = 1
+        info["interpretationtime"] = elapsed
+        self._statistics.round_trips += 1
+        for sink in self._sinks:
+            sink.OnEndRequest(self)
+
+    def _send_vkey(self, vkey):
+        okcd = self._elements["wnd[0]/tbar[0]/okcd"]
+        code = okcd._properties["text"].strip()
+        okcd._properties["text"] = ""
+        if code:
+            self._round_trip(lambda session: session._run_code(code))
+        else:
+            self._round_trip(None if self.on_vkey is None else lambda session: self.on_vkey(session, vkey))
+
+    def _run_code(self, code):
+        if code.lower().startswith("/n"):
+            code = code[2:]
+        if code == "" or code.lower() == "ex":
+            self._start_screen()
+            self._info._properties.update(transaction="SESSION_MANAGER", program="SAPLSMTR_NAVIGATION",
+                                          screennumber=100)
+            return
+        build_screen = self.transactions.get(code.upper())
+        if build_screen is None:
+            self.set_status("Transaction %s does not exist" % code.upper(), "E")
+            return
+        self._info._properties["transaction"] = code.upper()
+        self.new_screen("SAPL%s" % code.upper(), 1000)
+        build_screen(self)
+
+    def _get_id(self):
+        return self._id
+
+    def _get_info(self):
+        return self._info
+
+    def _get_children(self):
+        return FakeCollection(self._statistics, [self._elements["wnd[0]"]])
+
+    def _get_activewindow(self):
+        return self._elements["wnd[0]"]
+
+    def _call_findbyid(self, element_id, raise_error=True):
+        if element_id.startswith("/"):
+            prefix = self._id + "/"
+            if not element_id.startswith(prefix):
+                raise com_error("The control could not be found by id.")
+            element_id = element_id[len(prefix):]
+        element = self._elements.get(element_id)
+        if element is None and raise_error:
+            raise com_error("The control could not be found by id.")
+        return element
+
+    def _call_createsession(self):
+        if len(self._connection._sessions) >= self._connection._application._max_sessions:
+            raise com_error("The maximum number of sessions has been reached.")
+        self._connection._add_session()
+
+
+class FakeConnection(FakeObject):
+    def __init__(self, statistics, application, index, description, system="FAK", client="100"):
+        FakeObject.__init__(self, statistics, description=description)
+        self._application = application
+        self._id = "/app/con[%s]" % index
+        self._system = system
+        self._client = client
+        self._sessions = []
+        self._add_session()
+
+    def _add_session(self):
+        session = FakeSession(self._statistics, self, len(self._sessions))
+        self._sessions.append(session)
+        for setup in self._application.session_setups:
+            setup(session)
+        return session
+
+    def _get_id(self):
+        return self._id
+
+    def _get_children(self):
+        return FakeCollection(self._statistics, self._sessions)
+
+    _get_sessions = _get_children
+
+    def _call_closeconnection(self):
+        self._application._connections.remove(self)
+
+
+class FakeApplication(FakeObject):
+    """The GuiApplication of the fake scripting engine.
+
+    Functions in 'session_setups' are called with every new session, for example to register transactions.
+    """
+
+    def __init__(self, statistics=None, max_sessions=6):
+        FakeObject.__init__(self, statistics or FakeStatistics(), id="/app")
+        self._connections = []
+        self._max_sessions = max_sessions
+        object.__setattr__(self, "session_setups", [])
+
+    def add_connection(self, description, system="FAK", client="100"):
+        connection = FakeConnection(self._statistics, self, len(self._connections), description, system, client)
+        self._connections.append(connection)
+        return connection
+
+    def _get_children(self):
+        return FakeCollection(self._statistics, self._connections)
+
+    _get_connections = _get_children
+
+    def _call_openconnection(self, description, sync=True):
+        return self.add_connection(description)
+
+
+class FakeBackend(object):
+    """Backend for the library that uses the fake scripting engine, see `ComBackend` for the methods.
+    """
+
+    def __init__(self, latency=0.0, server_latency=0.0, application=None):
+        self.statistics = FakeStatistics(float(latency), float(server_latency))
+        self.application = application or FakeApplication(self.statistics)
+
+    def get_scripting_engine(self, instance=0, refresh=False):
+        return self.application
+
+    def connect_session_events(self, session, sink_class):
+        sink = sink_class()
+        session.add_event_sink(sink)
+        return sink
+
+    def pump_messages(self):
+        pass
+
+    def marshal(self, session):
+        return session
+
+    def unmarshal(self, marshalled):
+        return marshalled
+
+    def initialize_thread(self):
+        pass
+
+    def uninitialize_thread(self):
+        pass
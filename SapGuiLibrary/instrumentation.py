@@ -0,0 +1,225 @@
+import threading
+import time
+import types
+from collections import defaultdict
+from contextlib import contextmanager
+
+from .datafiles import RowWriter
+
+# Values that are returned as they are, everything else returned by a COM object is a COM object that is wrapped too
+PLAIN_TYPES = (type(None), bool, int, float, str, type(u""), bytes, tuple, list, dict)
+
+COLUMNS = ["scope", "name", "invocations", "com_calls", "method_calls", "property_gets", "property_sets",
+           "com_time", "server_wait", "sleep_time", "total_time", "members"]
+
+
+class ComProxy(object):
+    """Wraps a COM object and records every method call and property access in an `Instrumentation`.
+
+    Objects returned by the wrapped object (like the connections of the scripting engine, the sessions of a
+    connection and the elements found with findById) are wrapped as well. Attributes starting with an underscore, like
+    '_oleobj_', are passed on untouched, so the proxy can be given to win32com and pythoncom functions.
+    """
+
+    def __init__(self, target, instrumentation):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_instrumentation", instrumentation)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            return getattr(self._target, name)
+        start = time.time()
+        value = getattr(self._target, name)
+        if isinstance(value, types.MethodType):
+            return self._wrap_method(name, value, start)
+        self._instrumentation.record("property_gets", name, time.time() - start)
+        return self._instrumentation.wrap(value)
+
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            setattr(self._target, name, value)
+            return
+        start = time.time()
+        try:
+            setattr(self._target, name, value)
+        finally:
+            self._instrumentation.record("property_sets", name, time.time() - start)
+
+    def __call__(self, *args):
+        # Collections of COM objects, like Children, are called with the index of the item
+        start = time.time()
+        try:
+            value = self._target(*args)
+        finally:
+            self._instrumentation.record("method_calls", "Item", time.time() - start)
+        return self._instrumentation.wrap(value)
+
+    def __iter__(self):
+        for value in self._target:
+            yield self._instrumentation.wrap(value)
+
+    def __repr__(self):
+        return repr(self._target)
+
+    def _wrap_method(self, name, method, lookup_start):
+        instrumentation = self._instrumentation
+        lookup_time = time.time() - lookup_start
+
+        def call(*args, **kwargs):
+            start = time.time()
+            try:
+                value = method(*args, **kwargs)
+            finally:
+                instrumentation.record("method_calls", name, lookup_time + time.time() - start)
+            return instrumentation.wrap(value)
+        return call
+
+
+class Instrumentation:
+    """Counts and times the COM calls of the library per Robot keyword and per screen.
+
+    The time of a keyword is split into client COM time (the time spent in method calls and property accesses),
+    server wait (the time spent waiting for the session to finish its server request during synchronization) and
+    sleep time (the explicit wait). Calls made while waiting or sleeping are counted, but their time is part of the
+    server wait. COM calls are attributed to the innermost keyword that is running, so library keywords called from a
+    user keyword are reported separately.
+    """
+
+    def __init__(self):
+        self.keywords = {}
+        self.screens = {}
+        self._stack = []
+        self._phase = None
+        self._lock = threading.Lock()
+
+    def wrap(self, value):
+        if isinstance(value, PLAIN_TYPES) or isinstance(value, ComProxy):
+            return value
+        return ComProxy(value, self)
+
+    def start_keyword(self, name, screen=None):
+        self._stack.append({"name": name, "screen": screen, "start": time.time(), "counters": _new_counters()})
+
+    def end_keyword(self, screen=None):
+        """Ends the innermost keyword and adds its counters to the statistics of the keyword and of the screen. The
+        screen is the one the keyword ended on, or the one it started on when the screen was left.
+        Keywords that did not call Sap Gui and did not wait are left out.
+        """
+        if not self._stack:
+            return
+        frame = self._stack.pop()
+        counters = frame["counters"]
+        if not (counters["com_calls"] or counters["server_wait"] or counters["sleep_time"]):
+            return
+        counters["total_time"] = time.time() - frame["start"]
+        screen = screen or frame["screen"] or "unknown"
+        with self._lock:
+            _add_counters(self.keywords.setdefault(frame["name"], _new_counters(0)), counters)
+            _add_counters(self.screens.setdefault(screen, _new_counters(0)), counters)
+
+    def record(self, kind, member, seconds):
+        with self._lock:
+            counters = self._current()
+            counters[kind] += 1
+            counters["com_calls"] += 1
+            counters["members"][member] += 1
+            if self._phase is None:
+                counters["com_time"] += seconds
+
+    @contextmanager
+    def measure(self, phase):
+        """Adds the time spent in the block to 'phase' (server_wait or sleep_time) of the running keyword.
+        """
+        if self._phase is not None:
+            yield
+            return
+        self._phase = phase
+        start = time.time()
+        try:
+            yield
+        finally:
+            self._phase = None
+            with self._lock:
+                self._current()[phase] += time.time() - start
+
+    def statistics(self):
+        """Returns a row per keyword and per screen, ordered by total time with the slowest first.
+        """
+        rows = []
+        with self._lock:
+            for scope, table in (("keyword", self.keywords), ("screen", self.screens)):
+                for name, counters in sorted(table.items(), key=lambda item: -item[1]["total_time"]):
+                    row = dict(counters)
+                    row["scope"] = scope
+                    row["name"] = name
+                    members = sorted(counters["members"].items(), key=lambda item: -item[1])
+                    row["members"] = " ".join("%s=%s" % member for member in members[:5])
+                    for key in ("com_time", "server_wait", "sleep_time", "total_time"):
+                        row[key] = round(row[key], 6)
+                    rows.append(row)
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self.keywords = {}
+            self.screens = {}
+
+    def summary(self, limit=10):
+        """Returns a text table with the keywords that took the most time.
+        """
+        lines = ["%-40s %6s %8s %9s %9s %9s %9s" % ("Keyword", "Calls", "COM", "COM time", "Server", "Sleep",
+                                                    "Total")]
+        for row in [row for row in self.statistics() if row["scope"] == "keyword"][:limit]:
+            lines.append("%-40s %6s %8s %9.3f %9.3f %9.3f %9.3f" % (row["name"][:40], row["invocations"],
+                                                                    row["com_calls"], row["com_time"],
+                                                                    row["server_wait"], row["sleep_time"],
+                                                                    row["total_time"]))
+        return "\n".join(lines)
+
+    def write(self, path):
+        """Writes the statistics to a CSV file, or to a JSON file with a row per line.
+        """
+        with RowWriter(path, COLUMNS) as writer:
+            for row in self.statistics():
+                writer.write(row)
+
+    def _current(self):
+        if not self._stack:
+            # Calls made outside of Robot keywords, for example when the library is used from Python
+            return self.keywords.setdefault("(outside keywords)", _new_counters(0))
+        return self._stack[-1]["counters"]
+
+
+def _new_counters(invocations=1):
+    return {
+        "invocations": invocations,
+        "com_calls": 0,
+        "method_calls": 0,
+        "property_gets": 0,
+        "property_sets": 0,
+        "com_time": 0.0,
+        "server_wait": 0.0,
+        "sleep_time": 0.0,
+        "total_time": 0.0,
+        "members": defaultdict(int),
+    }
+
+
+def _add_counters(total, counters):
+    for key, value in counters.items():
+        if key == "members":
+            for member, count in value.items():
+                total["members"][member] += count
+        else:
+            total[key] += value
+
+
+@contextmanager
+def measure(instrumentation, phase):
+    """Measures a phase of the running keyword, see `Instrumentation.measure`. Does nothing without instrumentation.
+    """
+    if instrumentation is None:
+        yield
+    else:
+        with instrumentation.measure(phase):
+            yield
@@ -0,0 +1,81 @@
+import io
+import json
+import os
+import threading
+from collections import deque
+
+from .responsetimes import percentile
+
+
+class LatencyProfile:
+    """Durations of recent steps per transaction, program, screen and action, kept in a JSON history file.
+
+    The 95th percentile of the durations of a step is its baseline. A step that takes longer than the baseline
+    multiplied by 'factor' (and at least 'minimum_slowdown' seconds slower) is slow. The timeout for waiting on a step
+    is the baseline multiplied by 'timeout_factor', at least 'minimum_timeout' seconds. Steps with fewer than
+    'minimum_samples' durations have no baseline yet.
+    """
+
+    def __init__(self, path, factor=2.0, timeout_factor=10.0, minimum_timeout=5.0, minimum_samples=5,
+                 maximum_samples=50, minimum_slowdown=0.1):
+        self.path = path
+        self.factor = float(factor)
+        self.minimum_slowdown = float(minimum_slowdown)
+        self.timeout_factor = float(timeout_factor)
+        self.minimum_timeout = float(minimum_timeout)
+        self.minimum_samples = int(minimum_samples)
+        self.maximum_samples = int(maximum_samples)
+        self.steps = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Reads the history file, a missing file is an empty history.
+        """
+        if not os.path.exists(self.path):
+            return
+        with io.open(self.path, encoding="utf-8") as history:
+            steps = json.load(history)
+        for key, durations in steps.items():
+            self.steps[key] = deque(durations, maxlen=self.maximum_samples)
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        with self._lock:
+            steps = dict((key, list(durations)) for key, durations in self.steps.items())
+        with io.open(self.path, "w", encoding="utf-8") as history:
+            history.write(json.dumps(steps, indent=1, sort_keys=True, ensure_ascii=False))
+
+    def baseline(self, step):
+        """Returns the 95th percentile of the durations of the given step, or None when there are too few durations.
+        """
+        with self._lock:
+            durations = list(self.steps.get(_key(step), ()))
+        if len(durations) < self.minimum_samples:
+            return None
+        return percentile(durations, 95)
+
+    def timeout(self, step, default):
+        """Returns the time to wait for the given step, never more than 'default'.
+        """
+        baseline = self.baseline(step)
+        if baseline is None:
+            return default
+        return min(default, max(baseline * self.timeout_factor, self.minimum_timeout))
+
+    def add(self, step, duration):
+        """Adds the duration of a step and returns its baseline from before, when the step is slow, or None.
+        """
+        baseline = self.baseline(step)
+        with self._lock:
+            self.steps.setdefault(_key(step), deque(maxlen=self.maximum_samples)).append(round(duration, 4))
+        if baseline is not None and duration > max(baseline * self.factor, baseline + self.minimum_slowdown):
+            return baseline
+        return None
+
+
+def _key(step):
+    # JSON objects only have string keys, so the transaction, program, screen and action are joined
+    return "|".join(str(part) for part in step)
@@ -0,0 +1,87 @@
+from .snapshot import walk_elements
+
+STRATEGIES = ("label", "name", "text", "tooltip", "type")
+
+# Elements that get the text of the GuiLabel left of them as label
+FIELD_TYPES = ("GuiTextField", "GuiCTextField", "GuiPasswordField", "GuiComboBox", "GuiOkCodeField")
+
+# Elements that are labelled by their own text
+LABELLED_TYPES = ("GuiCheckBox", "GuiRadioButton")
+
+
+def parse_locator(locator):
+    """Returns the (strategy, value) of a locator like 'label=Material', or None when it is an element id.
+    """
+    if "=" not in locator:
+        return None
+    strategy, value = locator.split("=", 1)
+    strategy = strategy.strip().lower()
+    if strategy not in STRATEGIES:
+        return None
+    return strategy, normalize(value)
+
+
+def normalize(value):
+    """Returns a text without case, repeated whitespace and a trailing colon, the way it is compared in the index.
+    """
+    return " ".join(str(value).split()).rstrip(":").strip().lower()
+
+
+class LocatorIndex:
+    """Index of the elements of the windows of a screen by label, name, text, tooltip and type.
+
+    The windows are read once, in a single walk of the element tree each. Every lookup afterwards is a dictionary
+    lookup. When several elements match, the first element of the first window is returned, so the windows should be
+    given with the topmost window (like a popup) first.
+    """
+
+    def __init__(self, windows):
+        self._index = {}
+        for window in windows:
+            records = list(walk_elements(window))
+            for record in records:
+                for strategy in ("name", "text", "tooltip", "type"):
+                    self._add(strategy, record[strategy], record["id"])
+                if record["type"] in LABELLED_TYPES:
+                    self._add("label", record["text"], record["id"])
+            for label, field in associate_labels(records):
+                self._add("label", label["text"], field["id"])
+
+    def _add(self, strategy, value, element_id):
+        if value is None or str(value).strip() == "":
+            return
+        ids = self._index.setdefault((strategy, normalize(value)), [])
+        if element_id not in ids:
+            ids.append(element_id)
+
+    def find(self, strategy, value):
+        """Returns the ids of the elements matching the normalized value, the best match first.
+        """
+        return self._index.get((strategy, value), [])
+
+
+def associate_labels(records):
+    """Yields (label, field) pairs of every GuiLabel and the input field right of it on the same line.
+    """
+    fields = [record for record in records if record["type"] in FIELD_TYPES and _has_position(record)]
+    for label in records:
+        if label["type"] != "GuiLabel" or not _has_position(label):
+            continue
+        label_middle = label["top"] + label["height"] / 2.0
+        label_right = label["left"] + label["width"]
+        best = None
+        for field in fields:
+            if abs(field["top"] + field["height"] / 2.0 - label_middle) > max(label["height"], field["height"]) / 2.0:
+                continue
+            # Labels may overlap the field by a few pixels
+            distance = field["left"] - label_right
+            if distance < -label["width"] / 2.0:
+                continue
+            if best is None or distance < best[0]:
+                best = (distance, field)
+        if best is not None:
+            yield label, best[1]
+
+
+def _has_position(record):
+    return None not in (record["left"], record["top"], record["width"], record["height"])
@@ -0,0 +1,110 @@
+import threading
+import time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from .runner import transaction_command
+
+
+class ReadRecipe:
+    """Describes how a single work item is read: the transaction to start, the element(s) the item is entered into,
+    the virtual key that executes the selection and the elements whose values are read afterwards.
+    """
+
+    def __init__(self, transaction, read_ids, input_id=None, vkey=0, timeout=30.0):
+        self.transaction = transaction
+        self.read_ids = list(read_ids)
+        self.input_id = input_id
+        self.vkey = int(vkey)
+        self.timeout = timeout
+
+    def run(self, session, item):
+        """Reads a single item in the given session and returns a dictionary with element_id: value pairs and the
+        text of the status bar.
+        """
+        session.findById("wnd[0]/tbar[0]/okcd").text = transaction_command(self.transaction)
+        session.findById("wnd[0]").sendVKey(0)
+        self._wait_until_idle(session)
+
+        if isinstance(item, dict):
+            for element_id, value in item.items():
+                session.findById(element_id).text = value
+        else:
+            session.findById(self.input_id).text = item
+        session.findById("wnd[0]").sendVKey(self.vkey)
+        self._wait_until_idle(session)
+
+        result = {}
+        for element_id in self.read_ids:
+            element = session.findById(element_id)
+            if element.Type in ("GuiCheckBox", "GuiRadioButton"):
+                result[element_id] = "checked" if element.Selected else "unchecked"
+            else:
+                result[element_id] = element.Text
+        result["status"] = session.findById("wnd[0]/sbar").Text
+        return result
+
+    def _wait_until_idle(self, session):
+        end_time = time.time() + self.timeout
+        interval = 0.01
+        while session.Busy:
+            if time.time() >= end_time:
+                message = "Sap session is still busy after %s seconds" % self.timeout
+                raise RuntimeError(message)
+            time.sleep(interval)
+            interval = min(interval * 2, 0.2)
+
+
+def _marshal(session, backend):
+    # COM objects can only be used in another thread after marshalling them, other objects are passed as they are
+    if hasattr(session, "_oleobj_"):
+        return True, backend.marshal(session)
+    return False, session
+
+
+def _unmarshal(marshalled, backend):
+    is_marshalled, value = marshalled
+    if is_marshalled:
+        return backend.unmarshal(value)
+    return value
+
+
+def _worker(marshalled_session, recipe, work, results, backend):
+    backend.initialize_thread()
+    try:
+        session = _unmarshal(marshalled_session, backend)
+        while True:
+            try:
+                position, item = work.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                results[position] = recipe.run(session, item)
+            except Exception as error:
+                # Every item gets a result, an error only fails the item itself
+                results[position] = {"error": str(error)}
+    finally:
+        backend.uninitialize_thread()
+
+
+def read_in_parallel(sessions, items, recipe, backend):
+    """Reads all items with the recipe, spread over the given sessions with one COM initialized thread per session.
+
+    The session objects are marshalled to the threads. The results are returned in the order of the items, an item
+    that could not be read gets a dictionary with an 'error' key.
+    """
+    work = queue.Queue()
+    for position, item in enumerate(items):
+        work.put((position, item))
+    results = [None] * len(items)
+
+    threads = [threading.Thread(target=_worker, args=(_marshal(session, backend), recipe, work, results, backend))
+               for session in sessions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
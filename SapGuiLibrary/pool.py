@@ -0,0 +1,124 @@
+import threading
+import time
+
+
+class SessionPool:
+    """A pool of Sap sessions of a single connection that are leased to tests or worker threads.
+
+    The pool creates sessions with `CreateSession` until it contains 'size' sessions. A leased session is returned to
+    the start screen when it is released, so the next lease starts in a clean state. The pool is thread safe, `lease`
+    blocks until a session is free or the timeout expires.
+    """
+
+    def __init__(self, connection, size, timeout=30.0):
+        self.connection = connection
+        self.size = size
+        self.sessions = []
+        self.session_ids = []
+        self._condition = threading.Condition()
+        self._leased = {}
+        self._lease_counts = {}
+        self._busy_time = 0.0
+        self._created = time.time()
+        self.leases = 0
+        self.reuses = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._fill(timeout)
+
+    def _fill(self, timeout):
+        children = self.connection.Children
+        while children.Count < self.size:
+            count = children.Count
+            children(0).CreateSession()
+            end_time = time.time() + timeout
+            while self.connection.Children.Count <= count:
+                if time.time() >= end_time:
+                    message = "Sap did not create a new session within %s seconds, the maximum number of sessions " \
+                              "may have been reached" % timeout
+                    raise RuntimeError(message)
+                time.sleep(0.1)
+            children = self.connection.Children
+        self.sessions = [children(index) for index in range(self.size)]
+        self.session_ids = [session.Id for session in self.sessions]
+        for index in range(self.size):
+            self._lease_counts[index] = 0
+
+    def lease(self, index=None, timeout=None):
+        """Leases a free session and returns (index, session). With 'index' the session at that position is leased.
+
+        Waits until a session is free, for at most 'timeout' seconds when given. Raises RuntimeError on timeout.
+        """
+        start = time.time()
+        with self._condition:
+            while True:
+                free = [i for i in range(len(self.sessions)) if i not in self._leased]
+                if index is not None:
+                    free = [i for i in free if i == index]
+                if free:
+                    break
+                remaining = None if timeout is None else timeout - (time.time() - start)
+                if remaining is not None and remaining <= 0:
+                    message = "No free session in the session pool after %s seconds" % timeout
+                    raise RuntimeError(message)
+                self._condition.wait(remaining)
+
+            chosen = free[0]
+            wait = time.time() - start
+            self._leased[chosen] = time.time()
+            self.leases += 1
+            if self._lease_counts[chosen]:
+                self.reuses += 1
+            self._lease_counts[chosen] += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            return chosen, self.sessions[chosen]
+
+    def release(self, index, reset=True):
+        """Returns the session at 'index' to the pool, after navigating it to the start screen when 'reset' is True.
+        """
+        session = self.sessions[index]
+        try:
+            if reset:
+                session.findById("wnd[0]/tbar[0]/okcd").text = "/n"
+                session.findById("wnd[0]").sendVKey(0)
+        finally:
+            # The session is returned to the pool even when it cannot be reset, for example when a popup is open
+            with self._condition:
+                leased_at = self._leased.pop(index, None)
+                if leased_at is not None:
+                    self._busy_time += time.time() - leased_at
+                self._condition.notify()
+
+    def free_indexes(self):
+        """Returns the indexes of the sessions that are not leased.
+        """
+        with self._condition:
+            return [index for index in range(len(self.sessions)) if index not in self._leased]
+
+    def index_of(self, session):
+        """Returns the index of the given session within the pool, or None when it is not part of the pool.
+        """
+        try:
+            session_id = session.Id
+        except AttributeError:
+            return None
+        if session_id in self.session_ids:
+            return self.session_ids.index(session_id)
+        return None
+
+    def statistics(self):
+        with self._condition:
+            now = time.time()
+            busy_time = self._busy_time + sum(now - leased_at for leased_at in self._leased.values())
+            capacity = (now - self._created) * len(self.sessions)
+            return {
+                "size": len(self.sessions),
+                "leased": len(self._leased),
+                "leases": self.leases,
+                "reuses": self.reuses,
+                "total_wait": self.total_wait,
+                "max_wait": self.max_wait,
+                "average_wait": self.total_wait / self.leases if self.leases else 0.0,
+                "utilization": busy_time / capacity if capacity else 0.0,
+            }
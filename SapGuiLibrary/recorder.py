@@ -0,0 +1,100 @@
+import io
+import re
+
+# session.findById("wnd[0]/usr/txtA").text = "1"  or  session.findById("wnd[0]").sendVKey 0, the members may be
+# chained like session.findById("wnd[0]/usr/tblA").getAbsoluteRow(0).selected = true
+LINE = re.compile(r'^session\.findById\("((?:[^"]|"")*)"\)((?:\.\w+(?:\((?:[^"()]|"(?:[^"]|"")*")*\))?)+)'
+                  r'(?:\s*=\s*(.*)|\s+(.*))?$', re.IGNORECASE)
+MEMBER = re.compile(r'\.(\w+)(?:\(((?:[^"()]|"(?:[^"]|"")*")*)\))?')
+ARGUMENT = re.compile(r'\s*("(?:[^"]|"")*"|[^,]+)\s*(?:,|$)')
+PARAMETER = re.compile(r"\$\{(\w+)\}")
+
+# Methods that only change the Sap Gui client, all other methods may go to the server
+CLIENT_METHODS = ("setfocus", "setcurrentcell", "maximize", "restore", "iconify", "resizeworkingpane", "selectcolumn",
+                  "deselectcolumn", "selectall", "ensurevisiblehorizontalitem", "selectitem", "setselectionindexes")
+
+
+def read_recording(path):
+    """Returns the text of a recorded script. The recorder writes UTF-16 or the ANSI code page, depending on the
+    Sap Gui version.
+    """
+    with io.open(path, "rb") as script:
+        data = script.read()
+    if data.startswith(b"\xff\xfe") or data.startswith(b"\xfe\xff"):
+        return data.decode("utf-16")
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return data.decode("cp1252")
+
+
+def parse_literal(text):
+    """Converts a VBScript literal (string, number, True or False) to a Python value.
+    """
+    text = text.strip()
+    if text.startswith('"') and text.endswith('"') and len(text) >= 2:
+        return text[1:-1].replace('""', '"')
+    if text.lower() in ("true", "false"):
+        return text.lower() == "true"
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        message = "Cannot read value '%s', only strings, numbers, True and False are supported" % text
+        raise ValueError(message)
+
+
+def parse_arguments(text):
+    if text is None or not text.strip():
+        return []
+    return [parse_literal(match.group(1)) for match in ARGUMENT.finditer(text.strip()) if match.group(1).strip()]
+
+
+def parse_recording(text):
+    """Returns the operations of a recorded script as (line number, element id, chain, member, arguments, is property)
+    tuples. The lines that connect to Sap Gui, comments and other lines that do not start with 'session.' are skipped.
+
+    'chain' lists the members that lead from the element to the object of the operation as (name, arguments) pairs,
+    the arguments are None for a property. Arguments can only be literals, not expressions or variables.
+    """
+    operations = []
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line.lower().startswith("session."):
+            continue
+        match = LINE.match(line)
+        if match is None:
+            message = "Cannot replay line %s: '%s', only session.findById(...) lines are supported" % (number, line)
+            raise ValueError(message)
+        element_id, members, value, arguments = match.groups()
+        element_id = element_id.replace('""', '"')
+        chain = [(name, None if text is None else parse_arguments(text))
+                 for name, text in [found.groups() for found in MEMBER.finditer(members)]]
+        member, member_arguments = chain.pop()
+        if member_arguments is not None and (value is not None or arguments is not None):
+            message = "Cannot replay line %s: '%s', the last member cannot be called and assigned" % (number, line)
+            raise ValueError(message)
+        if value is not None:
+            operations.append((number, element_id, chain, member, [parse_literal(value)], True))
+        elif member_arguments is not None:
+            operations.append((number, element_id, chain, member, member_arguments, False))
+        else:
+            operations.append((number, element_id, chain, member, parse_arguments(arguments), False))
+    return operations
+
+
+def substitute(value, parameters):
+    """Replaces ${name} in a string with the given parameters, other values are returned as they are.
+    """
+    if not isinstance(value, type(u"")) and not isinstance(value, str):
+        return value
+
+    def replace(match):
+        if match.group(1) not in parameters:
+            message = "No value given for parameter '${%s}'" % match.group(1)
+            raise ValueError(message)
+        return str(parameters[match.group(1)])
+    return PARAMETER.sub(replace, value)
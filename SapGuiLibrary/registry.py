@@ -0,0 +1,115 @@
+from .backend import com_error
+
+
+class SessionRegistry:
+    """Index of all open connections and sessions of the scripting engine.
+
+    Sessions can be found by alias, session id, connection description, system name and system/client (for example
+    QA1/100). The registry is refreshed incrementally: only connections that are new or have a different description
+    or number of sessions are read again, connections that were closed are removed. An entry whose session no longer
+    matches what was read (for example because the client changed after logging in) is not returned by `find`, and
+    its connection is read again by the next refresh.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.aliases = {}
+        self._index = {}
+        self._connections = {}
+
+    def refresh(self, application, full=False):
+        """Reads the connections of the scripting engine that changed since the last refresh, or all connections when
+        'full' is True.
+        """
+        if full:
+            self._connections = {}
+        seen = set()
+        connections = application.Children
+        for connection_index in range(connections.Count):
+            connection = connections(connection_index)
+            connection_id = connection.Id
+            sessions = connection.Children
+            seen.add(connection_id)
+            fingerprint = (connection.Description, sessions.Count)
+            if self._connections.get(connection_id) == fingerprint:
+                continue
+            self._remove_connection(connection_id)
+            for session_index in range(fingerprint[1]):
+                self._add(connection, sessions(session_index))
+            self._connections[connection_id] = fingerprint
+
+        for connection_id in list(self._connections):
+            if connection_id not in seen:
+                self._remove_connection(connection_id)
+                del self._connections[connection_id]
+        self._build_index()
+
+    def _add(self, connection, session):
+        info = session.Info
+        self.entries[session.Id] = {
+            "id": session.Id,
+            "connection_id": connection.Id,
+            "description": connection.Description,
+            "system": info.SystemName,
+            "client": info.Client,
+            "user": info.User,
+            "connection": connection,
+            "session": session,
+        }
+
+    def _remove_connection(self, connection_id):
+        for session_id, entry in list(self.entries.items()):
+            if entry["connection_id"] == connection_id:
+                del self.entries[session_id]
+
+    def _build_index(self):
+        self._index = {}
+        # Entries are added in order of their id, so an identifier shared by several sessions points to the first one
+        for session_id in sorted(self.entries, reverse=True):
+            entry = self.entries[session_id]
+            for key in (entry["description"], entry["system"], "%s/%s" % (entry["system"], entry["client"]),
+                        session_id):
+                self._index[key] = session_id
+        for alias, session_id in self.aliases.items():
+            if session_id in self.entries:
+                self._index[alias] = session_id
+
+    def set_alias(self, alias, session_id):
+        self.aliases[alias] = session_id
+        self._index[alias] = session_id
+
+    def find(self, identifier):
+        """Returns the entry for the given alias, session id, description, system name or system/client, or None.
+        The session of the entry is checked to be still alive and to match what was read. When it does not, the
+        connection of the entry is read again by the next refresh and None is returned.
+        """
+        session_id = self._index.get(identifier)
+        if session_id is None or session_id not in self.entries:
+            return None
+        entry = self.entries[session_id]
+        try:
+            info = entry["session"].Info
+            current = (entry["session"].Id, entry["connection"].Description, info.SystemName, info.Client)
+        except (AttributeError, com_error):
+            current = None
+        if current != (entry["id"], entry["description"], entry["system"], entry["client"]):
+            self._connections.pop(entry["connection_id"], None)
+            return None
+        return entry
+
+    def overview(self):
+        """Returns a list with the description, system, client, user, id and aliases of every session.
+        """
+        overview = []
+        for session_id in sorted(self.entries):
+            entry = self.entries[session_id]
+            aliases = sorted(alias for alias, alias_id in self.aliases.items() if alias_id == session_id)
+            overview.append({
+                "id": session_id,
+                "description": entry["description"],
+                "system": entry["system"],
+                "client": entry["client"],
+                "user": entry["user"],
+                "aliases": aliases,
+            })
+        return overview
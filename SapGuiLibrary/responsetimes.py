@@ -0,0 +1,85 @@
+import math
+import threading
+
+from .datafiles import RowWriter
+
+# Counters of GuiSessionInfo that are recorded after each server interaction, with the name used in the statistics
+INFO_COUNTERS = [("ResponseTime", "response_time"), ("InterpretationTime", "interpretation_time"),
+                 ("RoundTrips", "round_trips"), ("Flushes", "flushes")]
+
+PERCENTILES = [50, 90, 95, 99]
+
+COLUMNS = ["transaction", "program", "screen", "count"]
+for _key in ("response_time", "interpretation_time"):
+    COLUMNS += ["%s_p%s" % (_key, percentile) for percentile in PERCENTILES] + ["%s_max" % _key]
+COLUMNS += ["round_trips_mean", "flushes_mean"]
+
+
+def percentile(values, percent):
+    """Returns the given percentile of a list of values with the nearest-rank method, or None for an empty list.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = int(math.ceil(percent / 100.0 * len(ordered))) - 1
+    return ordered[min(max(rank, 0), len(ordered) - 1)]
+
+
+def read_session_info(session):
+    """Reads the transaction, program, screen number and the counters of the last server interaction of a session.
+    Times are in milliseconds, as given by Sap Gui.
+    """
+    info = session.Info
+    step = {
+        "transaction": info.Transaction,
+        "program": info.Program,
+        "screen": info.ScreenNumber,
+    }
+    for name, key in INFO_COUNTERS:
+        step[key] = getattr(info, name)
+    return step
+
+
+class ResponseTimeRecorder:
+    """Collects the server counters of each step and aggregates them per transaction and screen.
+    """
+
+    def __init__(self):
+        self.steps = []
+        self._lock = threading.Lock()
+
+    def record(self, step):
+        with self._lock:
+            self.steps.append(step)
+
+    def statistics(self):
+        """Returns a row per transaction, program and screen with the number of steps, the percentiles and maximum
+        of the response and interpretation time, and the mean number of round trips and flushes.
+        """
+        groups = {}
+        with self._lock:
+            for step in self.steps:
+                groups.setdefault((step["transaction"], step["program"], step["screen"]), []).append(step)
+        rows = []
+        for (transaction, program, screen), steps in sorted(groups.items(), key=lambda item: str(item[0])):
+            row = {"transaction": transaction, "program": program, "screen": screen, "count": len(steps)}
+            for key in ("response_time", "interpretation_time"):
+                values = [step[key] for step in steps]
+                for percent in PERCENTILES:
+                    row["%s_p%s" % (key, percent)] = percentile(values, percent)
+                row["%s_max" % key] = max(values)
+            for key in ("round_trips", "flushes"):
+                row["%s_mean" % key] = round(float(sum(step[key] for step in steps)) / len(steps), 2)
+            rows.append(row)
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self.steps = []
+
+    def write(self, path):
+        """Writes the statistics to a CSV file, or to a JSON file with a row per line.
+        """
+        with RowWriter(path, COLUMNS) as writer:
+            for row in self.statistics():
+                writer.write(row)
@@ -0,0 +1,96 @@
+ACTIONS = ("input", "select", "unselect", "press", "vkey", "focus")
+
+# Message types of the status bar that mark a row as failed: error and abort
+FAILED_MESSAGE_TYPES = ("E", "A")
+
+
+def parse_step(step):
+    """Returns the (action, element id, value) of a step given as 'action | element id | value' or as a sequence.
+    """
+    if isinstance(step, (list, tuple)):
+        parts = [str(part).strip() for part in step]
+    else:
+        parts = [part.strip() for part in str(step).split("|")]
+    if len(parts) < 2 or len(parts) > 3:
+        message = "Step '%s' should be given as 'action | element id | value'" % (step,)
+        raise ValueError(message)
+    action = parts[0].lower().replace(" ", "_")
+    if action not in ACTIONS:
+        message = "Unknown action '%s' in step '%s', use %s" % (parts[0], step, ", ".join(ACTIONS))
+        raise ValueError(message)
+    value = parts[2] if len(parts) == 3 else None
+    if action == "vkey" and (value is None or "{" not in value):
+        # The number of the key may also come from a column of the row
+        try:
+            int(value)
+        except (TypeError, ValueError):
+            message = "Step '%s' should give the number of the virtual key as value" % (step,)
+            raise ValueError(message)
+    return action, parts[1], value
+
+
+def transaction_command(transaction):
+    """Returns the text for the command field that starts a transaction: '/n' and the transaction, unless the
+    transaction is already given as a command like /nXD01 or /oXD01.
+    """
+    transaction = transaction.strip()
+    if transaction.startswith("/"):
+        return transaction
+    return "/n%s" % transaction
+
+
+class TransactionTemplate:
+    """The steps that are executed for every row of data: the transaction to start and a list of actions on elements.
+
+    Values of steps can refer to the columns of a row as {column}. Only 'press' and 'vkey' steps (and starting the
+    transaction) go to the server; after each of them the session is waited for until it is idle.
+    """
+
+    def __init__(self, transaction, steps):
+        self.transaction = transaction
+        self.steps = [parse_step(step) for step in steps]
+
+    def run(self, row, find, round_trip):
+        """Executes the steps for a row. 'find' returns the element for an id, 'round_trip' calls the given function
+        and waits until the session is idle.
+        """
+        find("wnd[0]/tbar[0]/okcd").text = transaction_command(self.transaction)
+        round_trip(lambda: find("wnd[0]").sendVKey(0))
+        for action, element_id, value in self.steps:
+            if value is not None:
+                try:
+                    value = value.format(**row)
+                except KeyError as error:
+                    message = "The row has no column %s used in step '%s'" % (error, value)
+                    raise ValueError(message)
+            if action == "input":
+                find(element_id).text = value
+            elif action == "select":
+                element = find(element_id)
+                if element.Type == "GuiComboBox":
+                    element.key = value
+                else:
+                    element.selected = True
+            elif action == "unselect":
+                find(element_id).selected = False
+            elif action == "focus":
+                find(element_id).setFocus()
+            elif action == "press":
+                element = find(element_id)
+                if element.Type == "GuiTab":
+                    round_trip(element.select)
+                else:
+                    round_trip(element.press)
+            else:
+                window = find(element_id)
+                round_trip(lambda: window.sendVKey(int(value)))
+
+
+def close_popups(session, round_trip, attempts=5):
+    """Cancels popup windows (with F12) until the main window is the active window again.
+    """
+    for _ in range(attempts):
+        window = session.ActiveWindow
+        if window.Id.endswith("wnd[0]"):
+            return
+        round_trip(lambda: window.sendVKey(12))
@@ -0,0 +1,93 @@
+import hashlib
+import io
+import os
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+# GuiImageType of HardCopyToMemory
+PNG = 2
+
+
+def capture_window(window):
+    """Returns a PNG image of a Sap Gui window as bytes, captured by Sap Gui itself.
+    """
+    return bytes(bytearray(window.HardCopyToMemory(PNG)))
+
+
+class ScreenshotWriter:
+    """Writes screenshots to a directory on a background thread.
+
+    Images are compared by the hash of their content: an image identical to one written before is not written again,
+    its earlier file is used instead. When 'budget' (in bytes) is given, images are no longer written once the
+    written files would exceed it.
+    """
+
+    def __init__(self, directory, budget=None):
+        self.directory = directory
+        self.budget = budget
+        self.written_bytes = 0
+        self.written = 0
+        self.duplicates = 0
+        self.dropped = 0
+        self._paths = {}
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, name, image):
+        """Queues an image to be written as '<name>_<n>.png' and returns the path of the file and whether the image
+        is new. The path is None when the image does not fit in the budget.
+        """
+        digest = hashlib.sha1(image).hexdigest()
+        with self._lock:
+            path = self._paths.get(digest)
+            if path is not None:
+                self.duplicates += 1
+                return path, False
+            if self.budget is not None and self.written_bytes + len(image) > self.budget:
+                self.dropped += 1
+                return None, False
+            self.written += 1
+            self.written_bytes += len(image)
+            path = os.path.join(self.directory, "%s_%s.png" % (name, self.written))
+            self._paths[digest] = path
+        self._start()
+        self._queue.put((path, image))
+        return path, True
+
+    def flush(self):
+        """Waits until all queued images have been written.
+        """
+        if self._thread is not None:
+            self._queue.join()
+
+    def statistics(self):
+        return {
+            "written": self.written,
+            "written_bytes": self.written_bytes,
+            "duplicates": self.duplicates,
+            "dropped": self.dropped,
+        }
+
+    def _start(self):
+        if self._thread is None:
+            if not os.path.exists(self.directory):
+                os.makedirs(self.directory)
+            self._thread = threading.Thread(target=self._write_images, name="SapGuiLibrary screenshots")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _write_images(self):
+        while True:
+            path, image = self._queue.get()
+            try:
+                with io.open(path, "wb") as image_file:
+                    image_file.write(image)
+            except (IOError, OSError):
+                pass
+            finally:
+                self._queue.task_done()
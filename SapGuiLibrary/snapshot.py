@@ -0,0 +1,82 @@
+from .backend import com_error
+
+TEXT_TYPES = ("GuiTextField", "GuiCTextField", "GuiLabel", "GuiTitlebar", "GuiStatusbar",
+              "GuiStatusPane", "GuiButton", "GuiTab", "GuiShell", "GuiComboBox")
+SELECTABLE_TYPES = ("GuiCheckBox", "GuiRadioButton")
+
+
+def relative_id(element_id):
+    """Returns the id of an element starting from the window, so '/app/con[0]/ses[0]/wnd[0]/usr/txtA' becomes
+    'wnd[0]/usr/txtA'.
+    """
+    index = element_id.find("wnd[")
+    return element_id[index:] if index >= 0 else element_id
+
+
+def _read(element, name):
+    try:
+        return getattr(element, name)
+    except (AttributeError, com_error):
+        return None
+
+
+def read_element(element):
+    """Reads the properties of a single element into a dictionary.
+    """
+    element_type = _read(element, "Type")
+    record = {
+        "id": relative_id(_read(element, "Id") or ""),
+        "type": element_type,
+        "name": _read(element, "Name"),
+        "text": _read(element, "Text") if element_type in TEXT_TYPES + SELECTABLE_TYPES else None,
+        "tooltip": _read(element, "Tooltip"),
+        "selected": _read(element, "Selected") if element_type in SELECTABLE_TYPES else None,
+        "changeable": _read(element, "Changeable"),
+        "left": _read(element, "ScreenLeft"),
+        "top": _read(element, "ScreenTop"),
+        "width": _read(element, "Width"),
+        "height": _read(element, "Height"),
+    }
+    return record
+
+
+def walk_elements(element):
+    """Yields the records of the given element and all elements contained in it.
+    """
+    yield read_element(element)
+    if _read(element, "ContainerType"):
+        children = _read(element, "Children")
+        if children is None:
+            return
+        for index in range(children.Count):
+            for record in walk_elements(children(index)):
+                yield record
+
+
+class ScreenSnapshot:
+    """The properties of all elements of a screen, read in a single walk of the element tree.
+    """
+
+    def __init__(self, root):
+        self.elements = {}
+        for record in walk_elements(root):
+            self.elements[record["id"]] = record
+
+    def get(self, element_id):
+        return self.elements.get(element_id)
+
+    def value(self, element_id):
+        """Returns the value of an element the way `get value` does, or None when the snapshot cannot answer it.
+        """
+        record = self.elements.get(element_id)
+        if record is None:
+            return None
+        if record["type"] in SELECTABLE_TYPES:
+            if record["selected"] is None:
+                return None
+            return "checked" if record["selected"] else "unchecked"
+        if record["type"] in TEXT_TYPES and record["text"] is not None:
+            if record["type"] == "GuiComboBox":
+                return record["text"].strip()
+            return record["text"]
+        return None
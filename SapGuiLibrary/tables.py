@@ -0,0 +1,115 @@
+import re
+
+from .backend import com_error
+
+
+def get_grid_columns(grid):
+    """Returns the column ids of a GridView in the order they are displayed.
+    """
+    column_order = grid.ColumnOrder
+    return [column_order(i) for i in range(column_order.Count)]
+
+
+def iter_grid_rows(grid, columns, first_row=0, last_row=None):
+    """Yields (row number, values) tuples for the rows of a GridView, one page of visible rows at a time.
+
+    Setting 'firstVisibleRow' for every page makes the GridView load rows that are loaded lazily. The values are
+    returned in the order of 'columns'. The first visible row of the grid is restored afterwards.
+    """
+    row_count = grid.RowCount
+    if last_row is None or last_row >= row_count:
+        last_row = row_count - 1
+    if first_row > last_row:
+        return
+
+    original_first_row = grid.firstVisibleRow
+    try:
+        row = first_row
+        while row <= last_row:
+            grid.firstVisibleRow = row
+            page_end = min(row + max(grid.visibleRowCount, 1), last_row + 1)
+            for row_num in range(row, page_end):
+                yield row_num, [grid.getCellValue(row_num, column) for column in columns]
+            row = page_end
+    finally:
+        grid.firstVisibleRow = original_first_row
+
+
+def to_column_list(columns):
+    """Converts a comma separated string of column ids to a list. Lists are returned unchanged.
+    """
+    if columns is None:
+        return None
+    if isinstance(columns, str):
+        return [column.strip() for column in columns.split(",") if column.strip()]
+    return list(columns)
+
+
+def get_table_control_columns(table):
+    """Returns the column names of a GuiTableControl, taken from the cells of the first visible row.
+    """
+    columns = []
+    for index in range(table.Columns.Count):
+        try:
+            columns.append(table.getCell(0, index).Name)
+        except com_error:
+            columns.append(table.Columns(index).Title)
+    return columns
+
+
+def iter_table_control_rows(find_table, columns=None, first_row=0, last_row=None):
+    """Yields (row number, values) tuples for the rows of a GuiTableControl, scrolling one page at a time.
+
+    Only the cells of the column indexes in 'columns' are read, all columns when it is None. The values are returned
+    in the order of 'columns'. Scrolling a GuiTableControl rebuilds the screen, so 'find_table' is called to find the
+    table again after every scroll. The scroll position of the table is restored afterwards.
+    """
+    table = find_table()
+    row_count = table.RowCount
+    if columns is None:
+        columns = range(table.Columns.Count)
+    if last_row is None or last_row >= row_count:
+        last_row = row_count - 1
+    if first_row > last_row:
+        return
+
+    original_position = table.verticalScrollbar.position
+    try:
+        position = first_row
+        while position <= last_row:
+            if table.verticalScrollbar.position != position:
+                table.verticalScrollbar.position = position
+                table = find_table()
+            page_size = min(max(table.VisibleRowCount, 1), last_row - position + 1)
+            for offset in range(page_size):
+                yield position + offset, [table.getCell(offset, column).Text for column in columns]
+            position += page_size
+    finally:
+        if table.verticalScrollbar.position != original_position:
+            table.verticalScrollbar.position = original_position
+            find_table()
+
+
+def build_value_index(values):
+    """Returns a dictionary with the row numbers of every value in a list of column values.
+    """
+    index = {}
+    for row_num, value in enumerate(values):
+        index.setdefault(value, []).append(row_num)
+    return index
+
+
+def match_rows(values, expected, match="equals"):
+    """Returns the row numbers of the column values that match the expected value.
+
+    'match' is equals, contains or regex.
+    """
+    if match == "equals":
+        return [row_num for row_num, value in enumerate(values) if value == expected]
+    if match == "contains":
+        return [row_num for row_num, value in enumerate(values) if expected in value]
+    if match == "regex":
+        pattern = re.compile(expected)
+        return [row_num for row_num, value in enumerate(values) if pattern.search(value)]
+    message = "Unknown match '%s', use equals, contains or regex" % match
+    raise ValueError(message)
@@ -0,0 +1,105 @@
+from .backend import com_error
+
+
+def _to_list(collection):
+    if collection is None:
+        return []
+    return [collection(i) for i in range(collection.Count)]
+
+
+class TreeIndex:
+    """The nodes of a GuiTree read once: key, text, parent, children, whether the node is a folder and whether it is
+    expanded.
+
+    Reading the tree needs five calls per node (key, text, parent, folder and expanded state). Folders that are
+    collapsed may not have their children loaded yet; they are only expanded when a path leads through them, see
+    `find_path`.
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.nodes = {}
+        self.roots = []
+        keys = _to_list(tree.GetAllNodeKeys())
+        for key in keys:
+            self._read_node(key, tree.GetParent(key))
+        for key in keys:
+            parent = self.nodes[key]["parent"]
+            if parent in self.nodes:
+                self.nodes[parent]["children"].append(key)
+            else:
+                self.roots.append(key)
+
+    def _read_node(self, key, parent):
+        tree = self.tree
+        folder = bool(tree.IsFolder(key))
+        self.nodes[key] = {
+            "key": key,
+            "text": tree.GetNodeTextByKey(key),
+            "parent": parent or None,
+            "children": [],
+            "folder": folder,
+            "expanded": bool(tree.IsFolderExpanded(key)) if folder else False,
+        }
+
+    def expand(self, key):
+        """Expands a collapsed folder and reads the children it loaded.
+        """
+        self.tree.ExpandNode(key)
+        self.expanded(key)
+
+    def expanded(self, key):
+        """Updates a folder that was expanded on the tree: marks it as expanded and reads the children it loaded.
+        """
+        node = self.nodes[key]
+        if not node["folder"] or node["expanded"]:
+            return
+        node["expanded"] = True
+        for child in _to_list(self.tree.GetSubNodesCol(key)):
+            if child not in self.nodes:
+                self._read_node(child, key)
+                node["children"].append(child)
+
+    def find_path(self, path, separator="/"):
+        """Returns the key of the node with the given path of node texts, like 'Sales/Orders/Create', or None.
+
+        Collapsed folders on the path that have no matching child are expanded to load their children.
+        """
+        keys = self.roots
+        node = None
+        for text in [part.strip() for part in path.split(separator) if part.strip()]:
+            match = self._find_text(keys, text)
+            if match is None and node is not None and node["folder"] and not node["expanded"]:
+                try:
+                    self.expand(node["key"])
+                except com_error:
+                    return None
+                match = self._find_text(node["children"], text)
+            if match is None:
+                return None
+            node = self.nodes[match]
+            keys = node["children"]
+        return node["key"] if node is not None else None
+
+    def _find_text(self, keys, text):
+        for key in keys:
+            if (self.nodes[key]["text"] or "").strip() == text:
+                return key
+        return None
+
+    def rows(self):
+        """Returns the nodes in tree order with their level and path, as a list of dictionaries.
+        """
+        rows = []
+        stack = [(key, 0, "") for key in reversed(self.roots)]
+        while stack:
+            key, level, parent_path = stack.pop()
+            node = self.nodes[key]
+            path = "%s/%s" % (parent_path, (node["text"] or "").strip()) if parent_path else (node["text"] or "").strip()
+            row = dict(node)
+            row["children"] = list(node["children"])
+            row["level"] = level
+            row["path"] = path
+            rows.append(row)
+            stack.extend((child, level + 1, path) for child in reversed(node["children"]))
+        return rows
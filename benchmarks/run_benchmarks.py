@@ -0,0 +1,149 @@
+"""Measures the hot keywords of the SapGuiLibrary against the fake scripting engine.
+
+For every keyword the wall time, the number of findById calls, the total number of COM calls (method calls and
+property accesses), the number of server round trips and the number of synchronizations (explicit wait sleeps) are
+reported per keyword call. The results are written as JSON, so they can be compared between library versions:
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --output new.json --compare results.json
+
+With --compare the script exits with code 1 when a keyword needs more COM calls than in the given results.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from SapGuiLibrary import SapGuiLibrary  # noqa: E402
+from SapGuiLibrary.fake import (FakeBackend, FakeButton, FakeCheckBox, FakeGridView, FakeTextField,  # noqa: E402
+                                FakeComboBox)
+
+GRID = "wnd[0]/usr/cntlGRID1/shellcont/shell"
+GRID_ROWS = 1000
+
+
+def build_screen(session):
+    session.new_screen("SAPLZBENCH", 100, "Benchmark")
+    session.add_element(FakeTextField("wnd[0]/usr/txtNAME", "John"))
+    session.add_element(FakeTextField("wnd[0]/usr/ctxtMATNR", "100-100", element_type="GuiCTextField"))
+    session.add_element(FakeCheckBox("wnd[0]/usr/chkACTIVE", True))
+    session.add_element(FakeComboBox("wnd[0]/usr/cmbTYPE", "Standard"))
+    session.add_element(FakeButton("wnd[0]/usr/btnSAVE", "Save"))
+    session.add_element(FakeGridView(GRID, ["MATNR", "MAKTX", "MENGE"],
+                                     [{"MATNR": "100-%s" % row, "MAKTX": "Material %s" % row, "MENGE": str(row)}
+                                      for row in range(GRID_ROWS)]))
+
+
+def create_library(latency, server_latency, synchronization):
+    backend = FakeBackend(latency, server_latency)
+    backend.application.session_setups.append(lambda session: session.add_transaction("ZBENCH", build_screen))
+    library = SapGuiLibrary(screenshots_on_error=False, synchronization=synchronization, backend=backend)
+    library.connect_to_session()
+    library.open_connection("Benchmark system")
+    library.run_transaction("/nZBENCH")
+    return library, backend
+
+
+def get_cell_values(library):
+    for row in range(100):
+        library.get_cell_value(GRID, row, "MAKTX")
+
+
+BENCHMARKS = [
+    ("get_value", lambda library: library.get_value("wnd[0]/usr/txtNAME")),
+    ("element_value_should_be", lambda library: library.element_value_should_be("wnd[0]/usr/txtNAME", "John")),
+    ("input_text", lambda library: library.input_text("wnd[0]/usr/txtNAME", "John")),
+    ("get_cell_value (100 cells)", get_cell_values),
+    ("get_table_data (1000 rows)", lambda library: library.get_table_data(GRID)),
+    ("find_table_row", lambda library: library.find_table_row(GRID, MATNR="100-900")),
+    ("select_table_row", lambda library: library.select_table_row(GRID, 10)),
+    ("send_vkey", lambda library: library.send_vkey(0)),
+    ("run_transaction", lambda library: library.run_transaction("/nZBENCH")),
+]
+
+
+def run_benchmark(name, keyword, iterations, latency, server_latency, synchronization):
+    library, backend = create_library(latency, server_latency, synchronization)
+    synchronizations = [0]
+    synchronize = library._synchronize
+
+    def counting_synchronize(server=False):
+        synchronizations[0] += 1
+        synchronize(server)
+
+    library._synchronize = counting_synchronize
+    # A warm-up call fills the element cache, so the results show the cost of a call on a screen already in use
+    library._start_keyword(name, {})
+    keyword(library)
+    synchronizations[0] = 0
+    statistics = backend.statistics
+    statistics.reset()
+    start = time.time()
+    for _ in range(iterations):
+        # Robot calls the listener before every keyword, which makes the library check the screen again
+        library._start_keyword(name, {})
+        keyword(library)
+    wall_time = time.time() - start
+    return {
+        "iterations": iterations,
+        "wall_time": wall_time / iterations,
+        "findbyid": float(statistics.calls["findbyid"]) / iterations,
+        "com_calls": float(statistics.total) / iterations,
+        "round_trips": float(statistics.round_trips) / iterations,
+        "synchronizations": float(synchronizations[0]) / iterations,
+    }
+
+
+def compare(results, baseline):
+    regressions = []
+    for name, result in sorted(results.items()):
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric in ("findbyid", "com_calls", "round_trips"):
+            if result[metric] > previous[metric]:
+                regressions.append("%s: %s went from %.1f to %.1f" % (name, metric, previous[metric], result[metric]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated time of every COM call in seconds")
+    parser.add_argument("--server-latency", type=float, default=0.0,
+                        help="simulated time of every server round trip in seconds")
+    parser.add_argument("--synchronization", default="explicit", choices=["explicit", "idle", "events"])
+    parser.add_argument("--output", help="file to write the results to as JSON")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare the COM calls with")
+    args = parser.parse_args()
+
+    results = {}
+    print("%-28s %10s %10s %10s %10s %10s" % ("keyword", "ms/call", "findById", "COM calls", "trips", "syncs"))
+    for name, keyword in BENCHMARKS:
+        result = run_benchmark(name, keyword, args.iterations, args.latency, args.server_latency,
+                               args.synchronization)
+        results[name] = result
+        print("%-28s %10.3f %10.1f %10.1f %10.1f %10.1f" % (name, result["wall_time"] * 1000, result["findbyid"],
+                                                             result["com_calls"], result["round_trips"],
+                                                             result["synchronizations"]))
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"library_version": SapGuiLibrary.__version__, "python": platform.python_version(),
+                       "settings": vars(args), "results": results}, output, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file)["results"])
+        for regression in regressions:
+            print("REGRESSION %s" % regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -19,5 +19,5 @@ setup(
         "Programming Language :: Python :: 3.6",
         "Operating System :: Microsoft :: Windows",
     ),
-    install_requires=["pywin32>=222", "robotframework>=2.9"]
+    install_requires=["pywin32>=222; sys_platform == 'win32'", "robotframework>=2.9"]
 )
\ No newline at end of file